@@ -15,16 +15,22 @@ Steps:
     3. Judge — secondary (GPT)
     4. Summarize + statistical tests
 
-Ctrl+C is safe — each step writes results line-by-line with flush.
-Resume will skip already-processed papers automatically.
+When steps 2 and 3 are both scheduled they run concurrently (one thread
+per judge, separate output files).
+
+Ctrl+C is safe — each step appends results in small group-committed
+batches (OUTPUT_FLUSH_ROWS rows per write), flushed on exit. Resume will
+skip already-processed papers automatically and redo any unflushed ones.
 """
 
 import os
 import sys
-import json
 import time
 import signal
 import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime, timezone
 
@@ -41,6 +47,7 @@ from src.config import (
     REPORTS_DIR,
     ensure_dirs,
 )
+from src.utils import json_dumpb, json_loads, load_done_ids
 
 logging.basicConfig(
     level=logging.INFO,
@@ -65,33 +72,141 @@ def _signal_handler(sig, frame):
     _shutdown_requested = True
     logger.warning(
         "\n⚠️  Shutdown requested (Ctrl+C). "
-        "Finishing current paper, then saving checkpoint..."
+        "Finishing in-flight papers, then saving checkpoint..."
     )
 
 signal.signal(signal.SIGINT, _signal_handler)
 
 
+def _stop_requested() -> bool:
+    """should_stop hook for the judges: True once Ctrl+C was pressed."""
+    return _shutdown_requested
+
+
+def _raise_if_stopped():
+    """After a step returned early on Ctrl+C, report it as interrupted."""
+    if _shutdown_requested:
+        raise KeyboardInterrupt
+
+
+JSONL_INDEX_PATH = PROJECT_ROOT / "outputs" / ".jsonl_index.json"
+_SCAN_CHUNK = 1 << 20  # 1 MiB reads when scanning appended tails
+_TAIL_SIG_BYTES = 256  # bytes before the cached offset used to detect rewrites
+_INDEX_FORMAT = 2  # entries from older formats (counted blank lines) are rescanned
+
+
+def _load_jsonl_index() -> dict:
+    """Load the sidecar line-count index (empty if missing or unreadable)."""
+    try:
+        return json_loads(JSONL_INDEX_PATH.read_bytes())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_jsonl_index(index: dict):
+    """
+    Persist the sidecar index atomically (write a uniquely named tmp file,
+    then os.replace), so concurrent callers never share a temp file.
+    """
+    with tempfile.NamedTemporaryFile(
+        dir=JSONL_INDEX_PATH.parent, prefix=JSONL_INDEX_PATH.name,
+        suffix=".tmp", delete=False,
+    ) as f:
+        f.write(json_dumpb(index, indent=True))
+    os.replace(f.name, JSONL_INDEX_PATH)
+
+
+def _read_tail_sig(f, offset: int) -> str:
+    """Hex of the bytes just before `offset` — lets us tell appends from rewrites."""
+    start = max(0, offset - _TAIL_SIG_BYTES)
+    f.seek(start)
+    return f.read(offset - start).hex()
+
+
+def _scan_jsonl(path: Path, parse: bool) -> dict:
+    """
+    Return the cached index entry for `path`, scanning only what changed.
+
+    Entries are keyed by absolute path and store
+    {format, mtime_ns, size, offset, lines, successful, tail_sig}. If
+    (mtime_ns, size) match, the entry is returned as-is. If the file only
+    grew (the bytes before the cached offset are unchanged), we seek to the
+    offset and scan the appended tail; otherwise (e.g. clean_errors rewrote
+    the file) we rescan from the start. `lines` counts complete (\n-ended),
+    non-blank lines, like read_jsonl(), whichever way the entry was built.
+    The index file is only rewritten when an entry changed.
+
+    With parse=True, rows are also decoded to maintain `successful` (rows
+    whose "error" is None).
+    """
+    st = path.stat()
+    key = str(path.resolve())
+    index = _load_jsonl_index()
+    entry = index.get(key)
+
+    if entry and entry.get("format") != _INDEX_FORMAT:
+        entry = None
+    if entry and parse and entry.get("successful") is None:
+        entry = None  # Cached without parsing — need a full parse once
+    if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+        return entry
+
+    parse = parse or bool(entry and entry.get("successful") is not None)
+
+    with open(path, "rb") as f:
+        if entry and st.st_size >= entry["offset"] and \
+                _read_tail_sig(f, entry["offset"]) == entry["tail_sig"]:
+            offset, lines, successful = (
+                entry["offset"], entry["lines"], entry.get("successful")
+            )
+        else:
+            offset, lines, successful = 0, 0, 0 if parse else None
+
+        f.seek(offset)
+        pending = b""
+        while chunk := f.read(_SCAN_CHUNK):
+            # Only complete lines are consumed; a partial last line stays pending
+            pending += chunk
+            *complete, pending = pending.split(b"\n")
+            for line in complete:
+                offset += len(line) + 1
+                if not line.strip():
+                    continue
+                lines += 1
+                if parse and json_loads(line).get("error") is None:
+                    successful += 1
+
+        entry = {
+            "format": _INDEX_FORMAT,
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "offset": offset,
+            "lines": lines,
+            "successful": successful,
+            "tail_sig": _read_tail_sig(f, offset),
+        }
+
+    index[key] = entry
+    _save_jsonl_index(index)
+    return entry
+
+
 def count_jsonl(path: Path) -> int:
-    """Count lines in a JSONL file."""
+    """
+    Count rows (non-blank lines) in a JSONL file (incremental, via the
+    sidecar index). Lines are not decoded; a partial (unterminated) last
+    line is not counted until it completes.
+    """
     if not path.exists():
         return 0
-    with open(path) as f:
-        return sum(1 for line in f if line.strip())
+    return _scan_jsonl(path, parse=False)["lines"]
 
 
 def count_successful(path: Path) -> int:
-    """Count successful (non-error) entries in a JSONL file."""
+    """Count successful (non-error) entries in a JSONL file (incremental)."""
     if not path.exists():
         return 0
-    count = 0
-    with open(path) as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                row = json.loads(line)
-                if row.get("error") is None:
-                    count += 1
-    return count
+    return _scan_jsonl(path, parse=True)["successful"]
 
 
 def save_checkpoint(step: int, status: str, details: dict = None):
@@ -103,19 +218,29 @@ def save_checkpoint(step: int, status: str, details: dict = None):
         "timestamp": datetime.now(timezone.utc).isoformat(),
         "details": details or {},
     }
-    with open(CHECKPOINT_PATH, "w") as f:
-        json.dump(checkpoint, f, indent=2)
+    # Write-then-rename so an interrupted save never leaves a partial file
+    tmp_path = CHECKPOINT_PATH.with_suffix(".json.tmp")
+    tmp_path.write_bytes(json_dumpb(checkpoint, indent=True))
+    os.replace(tmp_path, CHECKPOINT_PATH)
     logger.info(f"Checkpoint saved: step {step} — {status}")
 
 
 def load_checkpoint() -> dict:
     """Load checkpoint if it exists."""
     if CHECKPOINT_PATH.exists():
-        with open(CHECKPOINT_PATH) as f:
-            return json.load(f)
+        return json_loads(CHECKPOINT_PATH.read_bytes())
     return {"last_completed_step": 0, "status": "not_started"}
 
 
+def _has_any(p: Path) -> bool:
+    """True if directory `p` exists and has at least one entry (one dir read)."""
+    try:
+        with os.scandir(p) as it:
+            return next(it, None) is not None
+    except FileNotFoundError:
+        return False
+
+
 def get_status() -> dict:
     """Get current experiment status."""
     cp = load_checkpoint()
@@ -126,7 +251,7 @@ def get_status() -> dict:
         "reviews_vanilla": count_successful(REVIEWS_VANILLA_JSONL),
         "judgments_claude": count_jsonl(JUDGMENTS_PAIRWISE_JUDGE1_JSONL),
         "judgments_gpt": count_jsonl(JUDGMENTS_PAIRWISE_JUDGE2_JSONL),
-        "reports_exist": REPORTS_DIR.exists() and any(REPORTS_DIR.iterdir()) if REPORTS_DIR.exists() else False,
+        "reports_exist": _has_any(REPORTS_DIR),
     }
 
 
@@ -169,9 +294,11 @@ def step_1_generate_reviews():
     """Step 1: Generate peer + vanilla reviews for all papers."""
     logger.info("STEP 1: Generating reviews (peer + vanilla)")
 
+    # Build the resume skip sets once; generation reuses them
     n_pairs = count_jsonl(PAIRS_JSONL_PATH)
-    n_peer = count_successful(REVIEWS_PEER_JSONL)
-    n_vanilla = count_successful(REVIEWS_VANILLA_JSONL)
+    done_peer = load_done_ids(REVIEWS_PEER_JSONL, successful_only=True)
+    done_vanilla = load_done_ids(REVIEWS_VANILLA_JSONL, successful_only=True)
+    n_peer, n_vanilla = len(done_peer), len(done_vanilla)
 
     if n_peer >= n_pairs and n_vanilla >= n_pairs:
         logger.info(
@@ -186,7 +313,7 @@ def step_1_generate_reviews():
     )
 
     from src.generation.generate_reviews_dual import main as gen_main
-    gen_main()
+    gen_main(done_peer=done_peer, done_vanilla=done_vanilla)
 
     n_peer = count_successful(REVIEWS_PEER_JSONL)
     n_vanilla = count_successful(REVIEWS_VANILLA_JSONL)
@@ -200,10 +327,9 @@ def step_2_judge_primary():
     """Step 2: Run primary judge (Claude)."""
     logger.info("STEP 2: Judging — Primary (Claude)")
 
-    # Override sys.argv for argparse inside the module
-    sys.argv = ["judge", "--judge", "1"]
     from src.judging.judge_pairwise_ab import main as judge_main
-    judge_main()
+    judge_main(judge_id=1, should_stop=_stop_requested)
+    _raise_if_stopped()
 
     n = count_jsonl(JUDGMENTS_PAIRWISE_JUDGE1_JSONL)
     logger.info(f"Step 2 complete: {n} judgments (Claude)")
@@ -214,26 +340,58 @@ def step_3_judge_secondary():
     """Step 3: Run secondary judge (GPT)."""
     logger.info("STEP 3: Judging — Secondary (GPT)")
 
-    sys.argv = ["judge", "--judge", "2"]
-    # Re-import to reset argparse state
-    import importlib
-    import src.judging.judge_pairwise_ab as judge_mod
-    importlib.reload(judge_mod)
-    judge_mod.main()
+    from src.judging.judge_pairwise_ab import main as judge_main
+    judge_main(judge_id=2, should_stop=_stop_requested)
+    _raise_if_stopped()
 
     n = count_jsonl(JUDGMENTS_PAIRWISE_JUDGE2_JSONL)
     logger.info(f"Step 3 complete: {n} judgments (GPT)")
     save_checkpoint(3, "judge2_complete", {"judgments_gpt": n})
 
 
+def step_2_3_judge_both():
+    """Steps 2+3: Run both judges concurrently (independent API calls + files)."""
+    logger.info("STEPS 2+3: Judging — Claude + GPT (concurrent)")
+
+    from src.judging.judge_pairwise_ab import main as judge_main
+    # Both judges stop taking new papers on the first Ctrl+C, or as soon as
+    # either of them fails (or a force quit raises SystemExit here); they
+    # then only finish the calls already in flight, and we don't wait.
+    failed = threading.Event()
+
+    def should_stop():
+        return _stop_requested() or failed.is_set()
+
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="judge")
+    try:
+        futures = [
+            pool.submit(judge_main, judge_id, should_stop)
+            for judge_id in (1, 2)
+        ]
+        for fut in as_completed(futures):
+            fut.result()  # Re-raise the first judge error, if any
+    except BaseException:
+        failed.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+    _raise_if_stopped()
+
+    n1 = count_jsonl(JUDGMENTS_PAIRWISE_JUDGE1_JSONL)
+    n2 = count_jsonl(JUDGMENTS_PAIRWISE_JUDGE2_JSONL)
+    logger.info(f"Steps 2+3 complete: {n1} judgments (Claude), {n2} (GPT)")
+    save_checkpoint(3, "judges_complete", {
+        "judgments_claude": n1, "judgments_gpt": n2
+    })
+
+
 def step_4_summarize_and_stats():
     """Step 4: Summarize results + run statistical tests."""
     logger.info("STEP 4: Summarizing + Statistical Tests")
 
     # Summarize both judges
-    sys.argv = ["summarize", "--all"]
     from src.reports.summarize_pairwise import main as sum_main
-    sum_main()
+    sum_main(all_judges=True)
 
     # Statistical tests
     from src.reports.statistical_tests import main as stat_main
@@ -260,6 +418,8 @@ STEPS = {
     4: ("Summarize + Stats", step_4_summarize_and_stats),
 }
 MAX_STEP = 4
+# Run in place of steps 2 and 3 when both are scheduled
+JUDGE_BOTH = ("Judge — Claude + GPT (concurrent)", step_2_3_judge_both)
 
 
 def main():
@@ -316,12 +476,20 @@ def main():
     logger.info(f"Steps to run: {steps_to_run}")
     t0 = time.time()
 
+    # The two judge passes are independent and network-bound — overlap them
+    fuse_judges = 2 in steps_to_run and 3 in steps_to_run
+    if fuse_judges:
+        steps_to_run.remove(3)
+
     for step_num in steps_to_run:
         if _shutdown_requested:
             logger.warning(f"Shutdown requested. Stopping before step {step_num}.")
             break
 
-        name, func = STEPS[step_num]
+        if fuse_judges and step_num == 2:
+            name, func = JUDGE_BOTH
+        else:
+            name, func = STEPS[step_num]
         logger.info(f"\n{'='*60}")
         logger.info(f"▶ Starting Step {step_num}/{MAX_STEP}: {name}")
         logger.info(f"{'='*60}")
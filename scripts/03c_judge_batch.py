@@ -0,0 +1,15 @@
+# Run: python scripts/03c_judge_batch.py
+# Usage:
+#   python scripts/03c_judge_batch.py --judge 1 --export batch.jsonl  → Write provider batch requests
+#   python scripts/03c_judge_batch.py --judge 1 --import results.jsonl → Merge downloaded batch results
+#   python scripts/03c_judge_batch.py --judge 1 --submit               → Export, submit, wait, import
+#   python scripts/03c_judge_batch.py --judge 1 --poll BATCH_ID        → Resume waiting on a batch
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.judging.judge_batch import main
+
+if __name__ == "__main__":
+    main()
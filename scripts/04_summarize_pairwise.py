@@ -3,12 +3,13 @@
 #   python scripts/04_summarize_pairwise.py          → Summarize Judge 1 (Claude)
 #   python scripts/04_summarize_pairwise.py --judge 2 → Summarize Judge 2 (GPT)
 #   python scripts/04_summarize_pairwise.py --all     → Summarize both judges
+#   python scripts/04_summarize_pairwise.py --all --bundle → One .zip (JSON+CSV+MD) per judge
 
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
-from src.reports.summarize_pairwise import main
+from src.reports.summarize_pairwise import cli
 
 if __name__ == "__main__":
-    main()
+    cli()
@@ -0,0 +1,11 @@
+# Run: python scripts/06_llm_metrics.py
+# Latency / throughput vs. concurrency from outputs/llm_metrics.csv
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.reports.llm_metrics import main
+
+if __name__ == "__main__":
+    main()
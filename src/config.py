@@ -25,6 +25,7 @@ REVIEWS_DIR = ICLR2017_DIR / "reviews"
 
 PAIRS_JSONL_PATH = PROCESSED_DIR / "pairs.jsonl"
 SAMPLE_PAIRS_JSONL_PATH = PROCESSED_DIR / "sample_pairs.jsonl"
+EXTRACT_CACHE_DIR = PROCESSED_DIR / ".extract_cache"  # per-paper extraction cache
 
 OUTPUTS_DIR = PROJECT_ROOT / "outputs"
 GENERATIONS_DIR = OUTPUTS_DIR / "generations"
@@ -35,6 +36,19 @@ REPORTS_DIR = OUTPUTS_DIR / "reports"
 REVIEWS_PEER_JSONL = GENERATIONS_DIR / "reviews_peer.jsonl"
 REVIEWS_VANILLA_JSONL = GENERATIONS_DIR / "reviews_vanilla.jsonl"
 
+# -------- LLM response cache --------
+# Re-runs with an unchanged (model, temperature, max tokens, prompt) skip the API.
+# Judges (temperature 0) use it; generation samples at GEN_TEMPERATURE, so a
+# cached review would replay an earlier draw — it only opts in explicitly.
+LLM_CACHE_ENABLED = True
+LLM_CACHE_GENERATION = False
+LLM_CACHE_PATH = OUTPUTS_DIR / ".llm_cache.sqlite3"
+
+# -------- LLM call metrics --------
+# One CSV row per HTTP attempt; analyse with scripts/06_llm_metrics.py
+LLM_METRICS_ENABLED = True
+LLM_METRICS_CSV = OUTPUTS_DIR / "llm_metrics.csv"
+
 # -------- Multi-judge output filenames --------
 JUDGMENTS_PAIRWISE_JUDGE1_JSONL = JUDGMENTS_DIR / "judgments_pairwise_claude.jsonl"
 JUDGMENTS_PAIRWISE_JUDGE2_JSONL = JUDGMENTS_DIR / "judgments_pairwise_gpt.jsonl"
@@ -51,6 +65,10 @@ DEFAULT_PAPER_MAX_CHARS = 50000
 # -------- Generation: NO truncation --------
 # All papers fit within context (max ~22K tokens, models support 128K+)
 GEN_PAPER_MAX_CHARS = 60000  # Above max paper size (50K) — effectively no truncation
+# Optional token budget instead of the character cap (needs tiktoken).
+# None keeps character truncation, which all existing generations used.
+GEN_PAPER_MAX_TOKENS = None
+GEN_TOKENIZER_ENCODING = "o200k_base"  # GPT-4o / GPT-5 family tokenizer
 
 # -------- Judge context limits --------
 # Full paper + full GT + 2 reviews still fits (max ~29K tokens)
@@ -65,6 +83,11 @@ RANDOM_SEED = 42
 LLM_PROVIDER = "openrouter"
 OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1/chat/completions"
 
+# -------- Provider batch APIs (judge_batch --submit/--poll; need OPENAI_API_KEY / ANTHROPIC_API_KEY) --------
+OPENAI_API_BASE = "https://api.openai.com/v1"
+ANTHROPIC_API_BASE = "https://api.anthropic.com/v1"
+BATCH_POLL_SECONDS = 60
+
 # -------- Generation Model --------
 GEN_MODEL_NAME = "openai/gpt-5.2"
 
@@ -89,6 +112,29 @@ GEN_MAX_RETRIES_INVALID = 3
 # Retries when judge returns "tie" (forced choice: must pick A or B)
 JUDGE_MAX_RETRIES_TIE = 2
 
+# -------- Concurrency --------
+# Papers generated concurrently (peer + vanilla each → 2x requests in flight).
+# Keep 2 * GEN_CONCURRENCY and 2 * JUDGE_CONCURRENCY within HTTP_POOL_SIZE.
+GEN_CONCURRENCY = 8
+# Papers judged concurrently, per judge (both judges may run at once)
+JUDGE_CONCURRENCY = 8
+# Keep-alive connections in the shared HTTP session (all clients combined)
+HTTP_POOL_SIZE = 32
+
+# -------- Judge rate limits (per judge model; None disables) --------
+# Proactive throttling below the provider limits instead of 429 + backoff.
+# Set to your account's tier.
+JUDGE_RPM = 300          # requests per minute
+JUDGE_TPM = 1_000_000    # (prompt + max completion) tokens per minute
+
+# -------- Output buffering --------
+# Rows per group-committed JSONL write (unflushed rows are redone on resume)
+OUTPUT_FLUSH_ROWS = 8
+# ...or as soon as the oldest buffered row is this many seconds old
+OUTPUT_FLUSH_SECS = 30.0
+# fsync each flushed batch (durable across OS crashes; costs one fsync per batch)
+OUTPUT_FSYNC = False
+
 
 def ensure_dirs():
     PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
@@ -1,8 +1,15 @@
 # src/data_prep/build_pairs.py
 # Build (paper + ground_truth) pairs from raw ICLR 2017 dataset (robust + clean)
 
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+import functools
+import hashlib
+import inspect
+import io
+import os
 import random
 import re
 
@@ -10,17 +17,21 @@ from src.config import (
     PARSED_PDFS_DIR,
     REVIEWS_DIR,
     PAIRS_JSONL_PATH,
+    EXTRACT_CACHE_DIR,
     DEFAULT_PAPER_MAX_CHARS,
     RANDOM_SEED,
     ensure_dirs,
 )
-from src.utils import read_json, write_jsonl
+from src.utils import json_dumpb, json_loads, read_json, write_jsonl
 
 
 # --- Quality gates (reduce noisy/generic reviews) ---
 MIN_PAPER_CHARS = 1500
 MIN_GT_CHARS = 200
 
+# Worker processes for per-paper extraction
+MAX_WORKERS = os.cpu_count() or 1
+
 
 def _is_junk_file(p: Path) -> bool:
     return p.name.startswith("._") or p.name.startswith(".")
@@ -32,38 +43,38 @@ def _paper_id_from_filename(filename: str) -> str:
 
 
 def _collect_strings(obj: Any, max_items: int = 2000) -> List[str]:
-    """Recursively collect string leaves as a fallback."""
+    """Collect string leaves (depth-first, document order) as a fallback."""
     out: List[str] = []
-
-    def walk(x: Any):
-        nonlocal out
-        if len(out) >= max_items:
-            return
-        if isinstance(x, str):
+    stack = [obj]
+
+    # Iterative walk: no recursion frames. Children are pushed in reverse so
+    # they pop in document order, matching the original recursive traversal.
+    while stack and len(out) < max_items:
+        x = stack.pop()
+        t = type(x)
+        if t is str:
             s = x.strip()
             if s:
                 out.append(s)
-        elif isinstance(x, dict):
-            for v in x.values():
-                walk(v)
-                if len(out) >= max_items:
-                    return
-        elif isinstance(x, list):
-            for v in x:
-                walk(v)
-                if len(out) >= max_items:
-                    return
-
-    walk(obj)
+        elif t is dict:
+            stack.extend(reversed(list(x.values())))
+        elif t is list:
+            stack.extend(reversed(x))
+
     return out
 
 
+# Only match whitespace that actually changes (2+ blanks, any tab; 3+ newlines)
+# so single spaces never hit the regex replacement path, and use constant
+# replacement strings so substitution stays in C (no per-match Python callback).
+_BLANKS_RE = re.compile(r"[ \t]{2,}|\t")
+_NEWLINES_RE = re.compile(r"\n{3,}")
+
+
 def _clean_text(s: str) -> str:
-    s = (s or "").strip()
     # collapse huge whitespace
-    s = re.sub(r"[ \t]+", " ", s)
-    s = re.sub(r"\n{3,}", "\n\n", s)
-    return s.strip()
+    s = _BLANKS_RE.sub(" ", (s or "").strip())
+    return _NEWLINES_RE.sub("\n\n", s).strip()
 
 
 def extract_paper_text(paper_json: Dict[str, Any]) -> str:
@@ -73,7 +84,14 @@ def extract_paper_text(paper_json: Dict[str, Any]) -> str:
       - abstract: metadata.abstractText
       - sections: metadata.sections[] with {heading, text}
     """
-    parts: List[str] = []
+    # Parts are written straight into one buffer ("\n\n"-separated) instead
+    # of a list + join, so the full text is only materialized once.
+    buf = io.StringIO()
+
+    def emit(part: str) -> None:
+        if buf.tell():
+            buf.write("\n\n")
+        buf.write(part)
 
     metadata = paper_json.get("metadata")
     if not isinstance(metadata, dict):
@@ -82,12 +100,12 @@ def extract_paper_text(paper_json: Dict[str, Any]) -> str:
     # Title
     title = metadata.get("title")
     if isinstance(title, str) and title.strip():
-        parts.append(f"TITLE: {title.strip()}")
+        emit(f"TITLE: {title.strip()}")
 
     # Abstract
     abstract = metadata.get("abstractText") or metadata.get("abstract")
     if isinstance(abstract, str) and abstract.strip():
-        parts.append(f"ABSTRACT: {abstract.strip()}")
+        emit(f"ABSTRACT: {abstract.strip()}")
 
     # Sections
     sections = metadata.get("sections")
@@ -100,30 +118,40 @@ def extract_paper_text(paper_json: Dict[str, Any]) -> str:
 
             if isinstance(text, str) and text.strip():
                 if isinstance(heading, str) and heading.strip():
-                    parts.append(f"{heading.strip()}\n{text.strip()}")
+                    emit(f"{heading.strip()}\n{text.strip()}")
                 else:
-                    parts.append(text.strip())
+                    emit(text.strip())
 
     # Fallback
-    if not parts:
-        parts = _collect_strings(paper_json, max_items=300)
+    fallback_parts: Optional[List[str]] = None
+    if not buf.tell():
+        fallback_parts = _collect_strings(paper_json, max_items=300)
+        for part in fallback_parts:
+            emit(part)
 
-    full_text = _clean_text("\n\n".join(parts))
+    full_text = _clean_text(buf.getvalue())
 
     # hard cap
     full_text = full_text[:DEFAULT_PAPER_MAX_CHARS]
 
+    # Common case: structured extraction succeeded — no second walk needed
+    if len(full_text) >= MIN_PAPER_CHARS:
+        return full_text
+
     # If we only captured a very short stub (e.g. just the title),
     # aggressively fall back to collecting all string leaves from the JSON.
     # This protects against schema drift where sections/abstract are stored
     # under unexpected keys and would otherwise produce title-only "papers".
-    if len(full_text) < MIN_PAPER_CHARS:
-        fallback_parts = _collect_strings(paper_json, max_items=300)
-        fallback_text = _clean_text("\n\n".join(fallback_parts))[:DEFAULT_PAPER_MAX_CHARS]
+    if fallback_parts is not None:
+        # Already built from the string leaves — re-walking would give the same text
+        return full_text
 
-        # Only overwrite if we actually obtained something longer / more informative
-        if len(fallback_text) > len(full_text):
-            full_text = fallback_text
+    fallback_parts = _collect_strings(paper_json, max_items=300)
+    fallback_text = _clean_text("\n\n".join(fallback_parts))[:DEFAULT_PAPER_MAX_CHARS]
+
+    # Only overwrite if we actually obtained something longer / more informative
+    if len(fallback_text) > len(full_text):
+        full_text = fallback_text
 
     return full_text
 
@@ -202,64 +230,126 @@ def extract_ground_truth(review_obj: Any) -> str:
     return gt
 
 
+@functools.lru_cache(maxsize=1)
+def _extract_code_hash() -> str:
+    """
+    sha256 over the source of the extractors (and the helpers they call) plus
+    the truncation limit. Any edit to them invalidates the extraction cache;
+    unrelated code/config changes do not.
+    """
+    h = hashlib.sha256()
+    for fn in (_collect_strings, _clean_text, extract_paper_text,
+               _normalize_review_root, extract_ground_truth):
+        h.update(inspect.getsource(fn).encode("utf-8"))
+    h.update(f"{_BLANKS_RE.pattern}|{_NEWLINES_RE.pattern}|{DEFAULT_PAPER_MAX_CHARS}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _load_cached_extraction(cache_path: Path, key: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """Return (paper_text, ground_truth) if the cache entry matches key, else None."""
+    try:
+        rec = json_loads(cache_path.read_bytes())
+    except (OSError, ValueError):
+        return None
+    if any(rec.get(k) != v for k, v in key.items()):
+        return None
+    return rec["paper_text"], rec["ground_truth"]
+
+
+def _save_cached_extraction(cache_path: Path, key: Dict[str, Any],
+                            paper_text: str, ground_truth: str) -> None:
+    rec = dict(key, paper_text=paper_text, ground_truth=ground_truth)
+    tmp = cache_path.with_suffix(".json.tmp")
+    tmp.write_bytes(json_dumpb(rec))
+    os.replace(tmp, cache_path)
+
+
+def _extract_one(task: Tuple[Path, Path]) -> Tuple[str, Optional[Dict[str, str]]]:
+    """
+    Worker: extract one (paper, ground_truth) pair.
+    Returns (status, pair) where status is "ok" or a skip reason.
+
+    Extractions are cached per paper under EXTRACT_CACHE_DIR, keyed on both
+    source files' mtimes and the extractor code hash.
+    """
+    pdf_path, review_path = task
+    paper_id = _paper_id_from_filename(pdf_path.name)
+
+    cache_path = EXTRACT_CACHE_DIR / f"{paper_id}.json"
+    key = {
+        "code_hash": _extract_code_hash(),
+        "pdf_mtime_ns": pdf_path.stat().st_mtime_ns,
+        "review_mtime_ns": review_path.stat().st_mtime_ns,
+    }
+
+    cached = _load_cached_extraction(cache_path, key)
+    if cached is not None:
+        paper_text, ground_truth = cached
+    else:
+        paper_text = extract_paper_text(read_json(pdf_path))
+        ground_truth = extract_ground_truth(read_json(review_path))
+        _save_cached_extraction(cache_path, key, paper_text, ground_truth)
+
+    if not paper_text.strip():
+        return "empty_paper", None
+    if not ground_truth.strip():
+        return "empty_gt", None
+
+    # --- Quality gates ---
+    if len(paper_text) < MIN_PAPER_CHARS:
+        return "too_short_paper", None
+    if len(ground_truth) < MIN_GT_CHARS:
+        return "too_short_gt", None
+
+    return "ok", {
+        "paper_id": paper_id,
+        "paper_text": paper_text,
+        "ground_truth": ground_truth,
+    }
+
+
 def build_pairs() -> List[Dict[str, str]]:
     random.seed(RANDOM_SEED)
     pairs: List[Dict[str, str]] = []
 
     pdf_files = sorted(PARSED_PDFS_DIR.glob("*.json"))
 
+    # One directory read instead of a stat() per paper
+    with os.scandir(REVIEWS_DIR) as it:
+        review_names = {entry.name for entry in it}
+
     missing_review = 0
-    empty_paper = 0
-    empty_gt = 0
-    too_short_paper = 0
-    too_short_gt = 0
+    tasks: List[Tuple[Path, Path]] = []
 
     for pdf_path in pdf_files:
         if _is_junk_file(pdf_path):
             continue
 
         paper_id = _paper_id_from_filename(pdf_path.name)
-        review_path = REVIEWS_DIR / f"{paper_id}.json"
+        review_name = f"{paper_id}.json"
 
-        if not review_path.exists():
+        if review_name not in review_names:
             missing_review += 1
             continue
 
-        paper_json = read_json(pdf_path)
-        review_obj = read_json(review_path)
-
-        paper_text = extract_paper_text(paper_json)
-        ground_truth = extract_ground_truth(review_obj)
-
-        if not paper_text.strip():
-            empty_paper += 1
-            continue
-        if not ground_truth.strip():
-            empty_gt += 1
-            continue
-
-        # --- Quality gates ---
-        if len(paper_text) < MIN_PAPER_CHARS:
-            too_short_paper += 1
-            continue
-        if len(ground_truth) < MIN_GT_CHARS:
-            too_short_gt += 1
-            continue
+        tasks.append((pdf_path, REVIEWS_DIR / review_name))
 
-        pairs.append(
-            {
-                "paper_id": paper_id,
-                "paper_text": paper_text,
-                "ground_truth": ground_truth,
-            }
-        )
+    # Extraction is CPU-bound and independent per paper; map() keeps input order
+    EXTRACT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    skipped = Counter()
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for status, pair in executor.map(_extract_one, tasks, chunksize=32):
+            if status == "ok":
+                pairs.append(pair)
+            else:
+                skipped[status] += 1
 
     print(f"[Debug] PDF files found: {len(pdf_files)}")
     print(f"[Debug] Missing review file: {missing_review}")
-    print(f"[Debug] Empty paper_text after extraction: {empty_paper}")
-    print(f"[Debug] Empty ground_truth after extraction: {empty_gt}")
-    print(f"[Debug] Too-short paper_text (<{MIN_PAPER_CHARS}): {too_short_paper}")
-    print(f"[Debug] Too-short ground_truth (<{MIN_GT_CHARS}): {too_short_gt}")
+    print(f"[Debug] Empty paper_text after extraction: {skipped['empty_paper']}")
+    print(f"[Debug] Empty ground_truth after extraction: {skipped['empty_gt']}")
+    print(f"[Debug] Too-short paper_text (<{MIN_PAPER_CHARS}): {skipped['too_short_paper']}")
+    print(f"[Debug] Too-short ground_truth (<{MIN_GT_CHARS}): {skipped['too_short_gt']}")
 
     return pairs
 
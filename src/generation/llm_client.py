@@ -1,28 +1,272 @@
 # src/generation/llm_client.py
 
 import os
+import csv
 import json
 import time
+import hashlib
 import logging
+import random
+import sqlite3
+import threading
+from pathlib import Path
+
 import requests
-from src.config import OPENROUTER_BASE_URL, MAX_RETRIES, RETRY_DELAY
+from requests.adapters import HTTPAdapter
+from src.generation.rate_limiter import RateLimiter
+from src.config import (
+    OPENROUTER_BASE_URL,
+    HTTP_POOL_SIZE,
+    MAX_RETRIES,
+    RETRY_DELAY,
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_PATH,
+    LLM_METRICS_ENABLED,
+    LLM_METRICS_CSV,
+)
 
 logger = logging.getLogger(__name__)
 
 # HTTP status codes that warrant a retry
 RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
 
+# Upper bound on a server-requested wait (Retry-After / rate-limit reset)
+MAX_SERVER_DELAY = 120.0
+
+
+def _server_delay(response: requests.Response) -> float | None:
+    """
+    Seconds the server asked us to wait, from Retry-After or, when the
+    rate-limit window is exhausted, X-RateLimit-Reset (epoch s or ms).
+    None if the response carries no usable hint.
+    """
+    headers = response.headers
+    retry_after = headers.get("Retry-After")
+    if retry_after:
+        try:
+            return min(max(float(retry_after), 0.0), MAX_SERVER_DELAY)
+        except ValueError:
+            pass  # HTTP-date form: fall back to backoff
+    if headers.get("X-RateLimit-Remaining") == "0":
+        try:
+            reset = float(headers["X-RateLimit-Reset"])
+        except (KeyError, ValueError):
+            return None
+        if reset > 1e12:  # OpenRouter reports milliseconds
+            reset /= 1000.0
+        return min(max(reset - time.time(), 0.0), MAX_SERVER_DELAY)
+    return None
+
+
+def backoff_delay(attempt: int, response: requests.Response | None = None) -> float:
+    """
+    Delay before retry number `attempt` (1-based): the server's hint if it
+    sent one, otherwise exponential backoff. Jitter is added either way so
+    concurrent workers do not retry in lockstep.
+    """
+    base = RETRY_DELAY * (2 ** (attempt - 1))
+    hint = _server_delay(response) if response is not None else None
+    if hint is not None:
+        return hint + random.uniform(0, RETRY_DELAY)
+    return base * random.uniform(0.5, 1.5)
+
+
+class ResponseCache:
+    """
+    On-disk response cache (SQLite): sha256(model|temperature|max_tokens|prompt)
+    -> response text. Shared by every client in the process; safe across threads.
+    """
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False,
+                                   isolation_level=None, timeout=30)
+        # WAL: readers never block the writer, so separate judge/generation
+        # processes can share the cache; NORMAL sync is safe with WAL
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, model TEXT, content TEXT, created REAL)"
+        )
+
+    @staticmethod
+    def key(model: str, temperature: float, max_output_tokens: int, prompt: str) -> str:
+        return hashlib.sha256(
+            f"{model}|{temperature}|{max_output_tokens}|{prompt}".encode("utf-8")
+        ).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT content FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, model: str, content: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, model, content, time.time()),
+            )
+
+
+_cache: ResponseCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache | None:
+    """Process-wide response cache (None when LLM_CACHE_ENABLED is False)."""
+    global _cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(LLM_CACHE_PATH)
+        return _cache
+
+
+class MetricsLog:
+    """
+    Append one CSV row per HTTP attempt (start time, latency, status, token
+    usage) for offline concurrency tuning; see src/reports/llm_metrics.py.
+    Shared by every client in the process; safe across threads.
+    """
+
+    FIELDS = [
+        "t_start", "latency_s", "status", "attempt", "model", "thread",
+        "prompt_chars", "prompt_tokens", "completion_tokens", "cached_tokens",
+    ]
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        new = not path.exists() or path.stat().st_size == 0
+        self._lock = threading.Lock()
+        self._f = open(path, "a", encoding="utf-8", newline="", buffering=1)
+        self._writer = csv.writer(self._f)
+        if new:
+            self._writer.writerow(self.FIELDS)
+
+    def record(self, t_start: float, latency: float, status, attempt: int,
+               model: str, prompt_chars: int, usage: dict | None = None) -> None:
+        usage = usage or {}
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", "")
+        row = [
+            f"{t_start:.3f}", f"{latency:.3f}", status, attempt, model,
+            threading.current_thread().name, prompt_chars,
+            usage.get("prompt_tokens", ""), usage.get("completion_tokens", ""),
+            cached,
+        ]
+        with self._lock:
+            self._writer.writerow(row)
+
+
+_metrics: MetricsLog | None = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics_log() -> MetricsLog | None:
+    """Process-wide metrics log (None when LLM_METRICS_ENABLED is False)."""
+    global _metrics
+    if not LLM_METRICS_ENABLED:
+        return None
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = MetricsLog(LLM_METRICS_CSV)
+        return _metrics
+
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+def get_session(api_key: str) -> requests.Session:
+    """
+    Process-wide HTTP session: every client (generation, both judges) reuses
+    the same keep-alive connection pool, sized for the configured concurrency.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE,
+                                  pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+            })
+            _session = session
+        return _session
+
 
 class LLMClient:
 
-    def __init__(self, model_name: str):
+    def __init__(self, model_name: str, rate_limiter: RateLimiter | None = None,
+                 use_cache: bool = False):
         self.model_name = model_name
+        self.rate_limiter = rate_limiter
         self.api_key = os.getenv("OPENROUTER_API_KEY")
+        # Response cache is opt-in: only deterministic callers should replay
+        self.cache = get_response_cache() if use_cache else None
+        self.metrics = get_metrics_log()
 
         if not self.api_key:
             raise EnvironmentError("OPENROUTER_API_KEY not set in environment.")
 
-    def generate(self, prompt: str, temperature: float, max_output_tokens: int) -> str:
+        # Shared session: keep-alive connections are pooled and reused across
+        # calls, threads and clients
+        self.session = get_session(self.api_key)
+
+    def _message_content(self, prompt: str, cache_prefix_chars: int):
+        """
+        Message content for the prompt. For Anthropic models the first
+        cache_prefix_chars characters (the part shared across calls) are sent
+        as a separate text block marked cache_control=ephemeral; the text is
+        unchanged. OpenAI models cache stable prefixes automatically, so they
+        get the plain string.
+        """
+        if cache_prefix_chars <= 0 or not self.model_name.startswith("anthropic/"):
+            return prompt
+        return [
+            {
+                "type": "text",
+                "text": prompt[:cache_prefix_chars],
+                "cache_control": {"type": "ephemeral"},
+            },
+            {"type": "text", "text": prompt[cache_prefix_chars:]},
+        ]
+
+    def generate(self, prompt: str, temperature: float, max_output_tokens: int,
+                 cache_prefix_chars: int = 0, refresh: bool = False) -> str:
+        """
+        Return the model's response text. With use_cache=True it is served
+        from the response cache when the same (model, temperature, max tokens,
+        prompt) was answered before.
+
+        refresh=True skips the lookup and overwrites the cached entry; callers
+        use it when retrying a response they rejected (invalid / tie).
+        """
+        if self.cache is None:
+            return self._generate(prompt, temperature, max_output_tokens,
+                                  cache_prefix_chars)
+
+        key = ResponseCache.key(self.model_name, temperature, max_output_tokens, prompt)
+        if not refresh:
+            content = self.cache.get(key)
+            if content is not None:
+                logger.info(f"[{self.model_name}] cache hit (~{len(content)} chars)")
+                return content
+
+        content = self._generate(prompt, temperature, max_output_tokens,
+                                 cache_prefix_chars)
+        self.cache.set(key, self.model_name, content)
+        return content
+
+    def _generate(self, prompt: str, temperature: float, max_output_tokens: int,
+                  cache_prefix_chars: int = 0) -> str:
         """
         Send a prompt to the LLM via OpenRouter with exponential backoff retry.
 
@@ -31,17 +275,18 @@ class LLMClient:
           - HTTP 500/502/503/504 (server errors)
           - Connection timeouts
 
+        cache_prefix_chars: length of the prompt prefix that is identical
+        across calls (template + skill); marked for provider prompt caching.
+
         Returns the model's response text.
         """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
-
         payload = {
             "model": self.model_name,
             "messages": [
-                {"role": "user", "content": prompt}
+                {
+                    "role": "user",
+                    "content": self._message_content(prompt, cache_prefix_chars),
+                }
             ],
             "temperature": temperature,
             "max_tokens": max_output_tokens,
@@ -50,12 +295,21 @@ class LLMClient:
 
         last_error = None
 
+        def record(status, attempt, usage=None):
+            if self.metrics is not None:
+                self.metrics.record(t0, time.time() - t0, status, attempt,
+                                    self.model_name, len(prompt), usage)
+
+        # Rough budget for the rate limiter: ~4 chars/token + full completion
+        est_tokens = len(prompt) // 4 + max_output_tokens
+
         for attempt in range(1, MAX_RETRIES + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(est_tokens)
             try:
                 t0 = time.time()
-                response = requests.post(
+                response = self.session.post(
                     OPENROUTER_BASE_URL,
-                    headers=headers,
                     json=payload,
                     timeout=180,  # 3 min timeout for long generations
                 )
@@ -63,11 +317,12 @@ class LLMClient:
 
                 if response.status_code == 200:
                     data = response.json()
+                    record(200, attempt, data.get("usage"))
 
                     # Handle missing/malformed response structure
                     choices = data.get("choices", [])
                     if not choices:
-                        delay = RETRY_DELAY * (2 ** (attempt - 1))
+                        delay = backoff_delay(attempt)
                         logger.warning(
                             f"[{self.model_name}] No choices in response "
                             f"(attempt {attempt}/{MAX_RETRIES}). "
@@ -100,7 +355,7 @@ class LLMClient:
                     if not content:
                         # Check for finish_reason clues
                         finish = choices[0].get("finish_reason", "unknown")
-                        delay = RETRY_DELAY * (2 ** (attempt - 1))
+                        delay = backoff_delay(attempt)
                         logger.warning(
                             f"[{self.model_name}] Empty content "
                             f"(finish_reason={finish}, "
@@ -113,15 +368,24 @@ class LLMClient:
                         time.sleep(delay)
                         continue
 
+                    usage = data.get("usage") or {}
+                    cached = (usage.get("prompt_tokens_details") or {}).get(
+                        "cached_tokens", 0
+                    )
                     logger.info(
                         f"[{self.model_name}] OK in {latency:.1f}s "
-                        f"(~{len(content)} chars)"
+                        f"(~{len(content)} chars, cached_tokens={cached})"
                     )
                     return content
 
+                record(response.status_code, attempt)
+
                 # Retryable error
                 if response.status_code in RETRYABLE_STATUS_CODES:
-                    delay = RETRY_DELAY * (2 ** (attempt - 1))
+                    delay = backoff_delay(attempt, response)
+                    if response.status_code == 429 and self.rate_limiter is not None:
+                        # Hold every worker sharing this limiter, not just this one
+                        self.rate_limiter.pause(delay)
                     logger.warning(
                         f"[{self.model_name}] HTTP {response.status_code} "
                         f"(attempt {attempt}/{MAX_RETRIES}), "
@@ -140,7 +404,8 @@ class LLMClient:
                 )
 
             except requests.exceptions.Timeout:
-                delay = RETRY_DELAY * (2 ** (attempt - 1))
+                record("timeout", attempt)
+                delay = backoff_delay(attempt)
                 logger.warning(
                     f"[{self.model_name}] Timeout "
                     f"(attempt {attempt}/{MAX_RETRIES}), "
@@ -151,7 +416,8 @@ class LLMClient:
                 continue
 
             except requests.exceptions.ConnectionError as e:
-                delay = RETRY_DELAY * (2 ** (attempt - 1))
+                record("connection_error", attempt)
+                delay = backoff_delay(attempt)
                 logger.warning(
                     f"[{self.model_name}] Connection error "
                     f"(attempt {attempt}/{MAX_RETRIES}), "
@@ -0,0 +1,63 @@
+# src/generation/rate_limiter.py
+
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Thread-safe token buckets for requests/minute and tokens/minute.
+
+    acquire() blocks until one request and the estimated tokens fit in both
+    buckets, so concurrent workers throttle themselves below the provider's
+    limits instead of discovering them through 429s. Buckets start full and
+    refill continuously; a limit of None disables that bucket. pause() stops
+    every caller for a while (used when the server returns 429/Retry-After).
+    """
+
+    def __init__(self, requests_per_minute: int | None = None,
+                 tokens_per_minute: int | None = None):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self._requests = float(self.rpm or 0)
+        self._tokens = float(self.tpm or 0)
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last
+        self._last = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens: int = 0) -> None:
+        """Block until a request with ~`tokens` tokens may be sent."""
+        if self.tpm:
+            tokens = min(tokens, self.tpm)  # a single oversize call must still pass
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._paused_until - now
+                if wait <= 0:
+                    short_req = 1 - self._requests if self.rpm else 0
+                    short_tok = tokens - self._tokens if self.tpm else 0
+                    if short_req <= 0 and short_tok <= 0:
+                        if self.rpm:
+                            self._requests -= 1
+                        if self.tpm:
+                            self._tokens -= tokens
+                        return
+                    wait = max(
+                        short_req * 60 / self.rpm if short_req > 0 else 0,
+                        short_tok * 60 / self.tpm if short_tok > 0 else 0,
+                    )
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Hold all callers for `seconds` (e.g. the server's Retry-After)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
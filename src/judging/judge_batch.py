@@ -0,0 +1,330 @@
+# src/judging/judge_batch.py
+"""
+Offline judging through provider batch APIs (OpenAI Batch, Anthropic
+Message Batches): same prompts, roughly half the price of synchronous calls,
+results within 24h. OpenRouter has no batch endpoint, so this is a
+file-based flow run against the provider directly:
+
+  1. --export: one batch request per unjudged paper, in the provider's
+     format (same prompt and blind A/B assignment as judge_pairwise_ab).
+  2. Submit the file with the provider's SDK/CLI/console; download results.
+  3. --import: merge the results into the judge's JSONL. Papers without a
+     valid A/B verdict are left out, so a normal (resumable) judge run
+     retries them.
+
+--submit does all three against the provider's HTTP API (OPENAI_API_KEY /
+ANTHROPIC_API_KEY): export, upload/create the batch, poll every
+BATCH_POLL_SECONDS until it ends, download and import. If the wait is
+interrupted, --poll BATCH_ID picks the same batch up again.
+
+Usage:
+  python scripts/03c_judge_batch.py --judge 1 --export batch_claude.jsonl
+  python scripts/03c_judge_batch.py --judge 1 --import results_claude.jsonl
+  python scripts/03c_judge_batch.py --judge 1 --submit
+  python scripts/03c_judge_batch.py --judge 1 --poll msgbatch_...
+"""
+
+import os
+import time
+import logging
+import argparse
+from pathlib import Path
+
+import requests
+
+from src.config import (
+    JUDGE_TEMPERATURE,
+    JUDGE_MAX_OUTPUT_TOKENS,
+    OUTPUT_FLUSH_ROWS,
+    JUDGMENTS_DIR,
+    OPENAI_API_BASE,
+    ANTHROPIC_API_BASE,
+    BATCH_POLL_SECONDS,
+    ensure_dirs,
+)
+from src.judging.judge_pairwise_ab import (
+    JUDGES,
+    ab_conditions,
+    build_judge_prompt,
+    load_judge_inputs,
+    parse_judge_output,
+)
+from src.utils import (
+    JsonlAppender,
+    json_dumpb,
+    load_done_ids,
+    read_jsonl,
+    write_jsonl,
+)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+def _provider_model(judge_model: str) -> tuple[str, str]:
+    """
+    OpenRouter model name -> (provider, provider model id).
+    Anthropic's API spells versions with hyphens (claude-opus-4-6).
+    """
+    provider, _, model = judge_model.partition("/")
+    if provider == "anthropic":
+        model = model.replace(".", "-")
+    elif provider != "openai":
+        raise ValueError(f"No batch API support for provider '{provider}'")
+    return provider, model
+
+
+def _batch_request(provider: str, model: str, paper_id: str, prompt: str) -> dict:
+    messages = [{"role": "user", "content": prompt}]
+    if provider == "anthropic":
+        return {
+            "custom_id": paper_id,
+            "params": {
+                "model": model,
+                "max_tokens": JUDGE_MAX_OUTPUT_TOKENS,
+                "temperature": JUDGE_TEMPERATURE,
+                "messages": messages,
+            },
+        }
+    return {
+        "custom_id": paper_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": model,
+            "messages": messages,
+            "temperature": JUDGE_TEMPERATURE,
+            "max_completion_tokens": JUDGE_MAX_OUTPUT_TOKENS,
+            "reasoning_effort": "none",
+        },
+    }
+
+
+def _result_text(row: dict) -> str | None:
+    """Response text of one batch result row (either provider), None if failed."""
+    if "result" in row:  # Anthropic
+        result = row["result"]
+        if result.get("type") != "succeeded":
+            return None
+        return "".join(
+            block.get("text", "")
+            for block in result["message"].get("content", [])
+            if block.get("type") == "text"
+        )
+    response = row.get("response") or {}  # OpenAI
+    if response.get("status_code") != 200:
+        return None
+    choices = response.get("body", {}).get("choices") or []
+    if not choices:
+        return None
+    return choices[0].get("message", {}).get("content")
+
+
+def export_batch(judge_id: int, path: Path) -> int:
+    """Write batch requests for every paper this judge has not judged yet."""
+    ensure_dirs()
+    judge_model, out_path, judge_label = JUDGES[judge_id]
+    provider, model = _provider_model(judge_model)
+
+    pairs_by_id, peer_by_id, vanilla_by_id, common_ids = load_judge_inputs()
+    done_ids = load_done_ids(out_path)
+
+    def requests_():
+        for paper_id in common_ids:
+            if paper_id in done_ids:
+                continue
+            _, _, prompt = build_judge_prompt(
+                paper_id, pairs_by_id[paper_id],
+                peer_by_id[paper_id]["generated_review"],
+                vanilla_by_id[paper_id]["generated_review"],
+            )
+            yield _batch_request(provider, model, paper_id, prompt)
+
+    rows = list(requests_())
+    write_jsonl(path, rows)
+    logger.info(
+        f"[{judge_label}] Exported {len(rows)} {provider} batch requests "
+        f"({len(done_ids)} already judged) → {path}"
+    )
+    return len(rows)
+
+
+def import_batch(judge_id: int, path: Path) -> int:
+    """Append valid A/B verdicts from a provider batch results file."""
+    ensure_dirs()
+    judge_model, out_path, judge_label = JUDGES[judge_id]
+
+    _, _, _, common_ids = load_judge_inputs()
+    common = set(common_ids)
+    done_ids = set(load_done_ids(out_path))
+
+    imported = skipped = 0
+    with JsonlAppender(out_path, "a", OUTPUT_FLUSH_ROWS, track_ids=True) as out:
+        for row in read_jsonl(path):
+            paper_id = row.get("custom_id")
+            if paper_id not in common or paper_id in done_ids:
+                continue
+
+            text = _result_text(row)
+            try:
+                parsed = parse_judge_output(text or "")
+            except ValueError:
+                parsed = {}
+            winner = parsed.get("winner")
+            if (winner or "").strip().lower() not in ("a", "b"):
+                skipped += 1
+                continue
+
+            # Same deterministic assignment the exported prompt used
+            cond_A, cond_B = ab_conditions(paper_id)
+            out.append({
+                "paper_id": paper_id,
+                "cond_A": cond_A,
+                "cond_B": cond_B,
+                "winner": winner,
+                "reasoning": parsed.get("reasoning"),
+                "judge_model": judge_model,
+            })
+            done_ids.add(paper_id)
+            imported += 1
+
+    logger.info(
+        f"[{judge_label}] Imported {imported} verdicts from {path}; "
+        f"{skipped} without a valid A/B winner left for a normal judge run."
+    )
+    return imported
+
+
+def _provider_api(provider: str) -> tuple[str, dict]:
+    """Base URL and auth headers for a provider's own (non-OpenRouter) API."""
+    env = "ANTHROPIC_API_KEY" if provider == "anthropic" else "OPENAI_API_KEY"
+    api_key = os.getenv(env)
+    if not api_key:
+        raise EnvironmentError(f"{env} not set in environment.")
+    if provider == "anthropic":
+        return ANTHROPIC_API_BASE, {"x-api-key": api_key, "anthropic-version": "2023-06-01"}
+    return OPENAI_API_BASE, {"Authorization": f"Bearer {api_key}"}
+
+
+def submit_batch(provider: str, requests_path: Path) -> str:
+    """Create a provider batch from an exported requests file; returns its ID."""
+    base, headers = _provider_api(provider)
+    if provider == "anthropic":
+        body = json_dumpb({"requests": list(read_jsonl(requests_path))})
+        r = requests.post(
+            f"{base}/messages/batches",
+            headers={**headers, "content-type": "application/json"},
+            data=body, timeout=600,
+        )
+        r.raise_for_status()
+        return r.json()["id"]
+
+    with open(requests_path, "rb") as f:
+        r = requests.post(
+            f"{base}/files", headers=headers, data={"purpose": "batch"},
+            files={"file": (requests_path.name, f)}, timeout=600,
+        )
+    r.raise_for_status()
+    r = requests.post(
+        f"{base}/batches", headers=headers, timeout=60,
+        json={
+            "input_file_id": r.json()["id"],
+            "endpoint": "/v1/chat/completions",
+            "completion_window": "24h",
+        },
+    )
+    r.raise_for_status()
+    return r.json()["id"]
+
+
+def wait_for_batch(provider: str, batch_id: str, results_path: Path) -> Path:
+    """Poll a batch every BATCH_POLL_SECONDS until it ends; download its results."""
+    base, headers = _provider_api(provider)
+    if provider == "anthropic":
+        url, status_key, final = f"{base}/messages/batches/{batch_id}", "processing_status", {"ended"}
+    else:
+        url, status_key = f"{base}/batches/{batch_id}", "status"
+        final = {"completed", "expired", "cancelled", "failed"}
+
+    while True:
+        r = requests.get(url, headers=headers, timeout=60)
+        r.raise_for_status()
+        batch = r.json()
+        status = batch.get(status_key)
+        if status in final:
+            break
+        logger.info(f"Batch {batch_id}: {status}; next check in {BATCH_POLL_SECONDS}s")
+        time.sleep(BATCH_POLL_SECONDS)
+
+    if provider == "anthropic":
+        results_url = batch["results_url"]
+    elif batch.get("output_file_id"):
+        # expired/cancelled batches still return the requests that finished
+        results_url = f"{base}/files/{batch['output_file_id']}/content"
+    else:
+        raise RuntimeError(f"Batch {batch_id} {status} without results: {batch.get('errors')}")
+
+    with requests.get(results_url, headers=headers, stream=True, timeout=600) as r:
+        r.raise_for_status()
+        with open(results_path, "wb") as f:
+            for chunk in r.iter_content(1 << 20):
+                f.write(chunk)
+    logger.info(f"Batch {batch_id}: {status}; results → {results_path}")
+    return results_path
+
+
+def poll_batch(judge_id: int, batch_id: str) -> int:
+    """Wait for a submitted batch, then import its verdicts."""
+    judge_model, _, judge_label = JUDGES[judge_id]
+    provider, _ = _provider_model(judge_model)
+    results_path = JUDGMENTS_DIR / f"batch_{judge_label}_{batch_id}.jsonl"
+    wait_for_batch(provider, batch_id, results_path)
+    return import_batch(judge_id, results_path)
+
+
+def submit_and_import(judge_id: int) -> int:
+    """Export unjudged papers, submit them as one batch, wait, import."""
+    judge_model, _, judge_label = JUDGES[judge_id]
+    provider, _ = _provider_model(judge_model)
+    requests_path = JUDGMENTS_DIR / f"batch_{judge_label}_requests.jsonl"
+    if not export_batch(judge_id, requests_path):
+        return 0
+    batch_id = submit_batch(provider, requests_path)
+    logger.info(
+        f"[{judge_label}] Submitted {provider} batch {batch_id} "
+        f"(if interrupted, resume with --poll {batch_id})"
+    )
+    return poll_batch(judge_id, batch_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pairwise judge via provider batch APIs")
+    parser.add_argument(
+        "--judge", type=int, default=1, choices=[1, 2],
+        help="Judge number: 1=primary (Claude), 2=secondary (GPT)"
+    )
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--export", type=Path, help="Write batch requests to this JSONL")
+    group.add_argument("--import", dest="import_", type=Path,
+                       help="Merge a downloaded batch results JSONL")
+    group.add_argument("--submit", action="store_true",
+                       help="Export, submit via the provider API, wait and import")
+    group.add_argument("--poll", metavar="BATCH_ID",
+                       help="Wait for an already submitted batch and import it")
+    args = parser.parse_args()
+
+    if args.export:
+        export_batch(args.judge, args.export)
+    elif args.import_:
+        import_batch(args.judge, args.import_)
+    elif args.submit:
+        submit_and_import(args.judge)
+    else:
+        poll_batch(args.judge, args.poll)
+
+
+if __name__ == "__main__":
+    main()
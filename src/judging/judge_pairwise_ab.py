@@ -1,9 +1,13 @@
-import json
 import random
+import re
+import functools
 import hashlib
 import logging
 import argparse
 from pathlib import Path
+from typing import Callable
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 from src.config import (
     PAIRS_JSONL_PATH,
@@ -18,11 +22,19 @@ from src.config import (
     JUDGE_PAPER_MAX_CHARS,
     JUDGE_GT_MAX_CHARS,
     JUDGE_MAX_RETRIES_TIE,
+    JUDGE_CONCURRENCY,
+    JUDGE_RPM,
+    JUDGE_TPM,
     RANDOM_SEED,
+    OUTPUT_FLUSH_ROWS,
+    OUTPUT_FLUSH_SECS,
+    OUTPUT_FSYNC,
     PROJECT_ROOT,
     ensure_dirs,
 )
 from src.generation.llm_client import LLMClient
+from src.generation.rate_limiter import RateLimiter
+from src.utils import JsonlAppender, json_loads, load_done_ids, read_jsonl
 
 logging.basicConfig(
     level=logging.INFO,
@@ -33,200 +45,355 @@ logger = logging.getLogger(__name__)
 PROMPT_PATH = PROJECT_ROOT / "prompts" / "judge_pairwise_ab.txt"
 
 
-def read_jsonl(path):
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                yield json.loads(line)
+@functools.lru_cache(maxsize=1)
+def load_prompt() -> str:
+    """
+    Read the judge template once per process. Both judges, their worker
+    threads and the batch driver share the same cached string.
+    """
+    return PROMPT_PATH.read_text(encoding="utf-8")
 
 
-def load_prompt() -> str:
-    with open(PROMPT_PATH, "r", encoding="utf-8") as f:
-        return f.read()
+# Outermost {...} span: skips code fences and any prose around the object
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def parse_judge_output(text: str) -> dict:
+    """Parse the judge's JSON verdict, tolerating fences/prose around it."""
+    m = _JSON_OBJECT_RE.search(text)
+    if m is None:
+        raise ValueError(f"No JSON object in judge output: {text[:100]!r}")
+    return json_loads(m.group(0))
+
+
+# Placeholders filled per paper; re.split keeps them at the odd indices
+_PLACEHOLDER_RE = re.compile(r"\{(paper_text|ground_truth|review_A|review_B)\}")
+
+
+@functools.lru_cache(maxsize=4)
+def split_template(template: str) -> tuple:
+    """Template -> (literal, name, literal, name, ..., literal), split once."""
+    return tuple(_PLACEHOLDER_RE.split(template))
 
 
-def truncate_for_judge(text: str, max_chars: int) -> str:
-    """Truncate text for judge prompt to fit context window."""
-    if not text or len(text) <= max_chars:
+def prompt_skeleton(template: str, paper_text: str, ground_truth: str) -> tuple:
+    """
+    Template with one paper's text and ground truth filled in, left split
+    around the review placeholders: (literal, "review_A"|"review_B", ...).
+    Built once per paper; only the two reviews are joined in per prompt.
+    """
+    fill = {"paper_text": paper_text, "ground_truth": ground_truth}
+    skeleton, literal = [], []
+    for i, part in enumerate(split_template(template)):
+        if not i % 2:
+            literal.append(part)
+        elif part in fill:
+            literal.append(fill[part])
+        else:
+            skeleton += ["".join(literal), part]
+            literal = []
+    skeleton.append("".join(literal))
+    return tuple(skeleton)
+
+
+def truncate_for_judge(text: str, max_chars: int | None) -> str:
+    """Truncate text for judge prompt to fit context window (None: keep all)."""
+    if not text or max_chars is None or len(text) <= max_chars:
         return text or ""
-    return text[:max_chars].rstrip() + "\n\n[...TRUNCATED...]"
+    cut = text[:max_chars]
+    if cut[-1].isspace():
+        cut = cut.rstrip()
+    return cut + "\n\n[...TRUNCATED...]"
 
 
-def load_existing_ids(path: Path) -> set:
-    """Load paper IDs already judged (for resume)."""
-    ids = set()
-    if path.exists():
-        for row in read_jsonl(path):
-            ids.add(row["paper_id"])
-    return ids
+# judge_id -> (model, output path, label)
+JUDGES = {
+    1: (JUDGE_MODEL_NAME, JUDGMENTS_PAIRWISE_JUDGE1_JSONL, "judge1_claude"),
+    2: (JUDGE_MODEL_NAME_2, JUDGMENTS_PAIRWISE_JUDGE2_JSONL, "judge2_gpt"),
+}
 
 
-def main():
+def load_judge_inputs(pairs_path: Path = PAIRS_JSONL_PATH,
+                      peer_path: Path = REVIEWS_PEER_JSONL,
+                      vanilla_path: Path = REVIEWS_VANILLA_JSONL,
+                      truncate: bool = True):
     """
-    Pairwise LLM-as-a-Judge with multi-judge support and resume.
+    Load pairs and successful peer/vanilla reviews.
+    Returns (pairs_by_id, peer_by_id, vanilla_by_id, common_ids), where
+    common_ids are the paper IDs present in all three, in pairs-file order
+    (build_pairs writes pairs sorted by paper ID).
+
+    pairs_by_id holds only what the judge prompt needs: the prompt
+    "skeleton" (template + truncated paper_text / ground_truth, see
+    prompt_skeleton), built once per paper at load time, so the full paper
+    texts are not kept in memory. truncate=False keeps the texts whole.
+    """
+    if not pairs_path.exists():
+        raise FileNotFoundError(
+            f"Pairs file not found: {pairs_path}. "
+            f"Run scripts/01_build_pairs.py first."
+        )
 
-    Usage:
-      python scripts/03_judge_pairwise_ab.py               # Judge 1 (Claude, primary)
-      python scripts/03_judge_pairwise_ab.py --judge 2      # Judge 2 (GPT, secondary)
+    template = load_prompt()
+    paper_max = JUDGE_PAPER_MAX_CHARS if truncate else None
+    gt_max = JUDGE_GT_MAX_CHARS if truncate else None
+
+    def load_pairs():
+        return {
+            row["paper_id"]: {
+                "skeleton": prompt_skeleton(
+                    template,
+                    truncate_for_judge(row["paper_text"], paper_max),
+                    truncate_for_judge(row["ground_truth"], gt_max),
+                ),
+            }
+            for row in read_jsonl(pairs_path)
+        }
+
+    def load_reviews(path):
+        if not path.exists():
+            return {}
+        return {
+            row["paper_id"]: row
+            for row in read_jsonl(path)
+            if row.get("error") is None
+        }
+
+    # The three files are independent: read them concurrently
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        pairs_fut = pool.submit(load_pairs)
+        peer_fut = pool.submit(load_reviews, peer_path)
+        vanilla_fut = pool.submit(load_reviews, vanilla_path)
+        pairs_by_id = pairs_fut.result()
+        peer_by_id = peer_fut.result()
+        vanilla_by_id = vanilla_fut.result()
+
+    common_ids = [
+        pid for pid in pairs_by_id if pid in peer_by_id and pid in vanilla_by_id
+    ]
+    return pairs_by_id, peer_by_id, vanilla_by_id, common_ids
+
+
+@functools.lru_cache(maxsize=None)
+def ab_conditions(paper_id: str) -> tuple[str, str]:
     """
-    parser = argparse.ArgumentParser(description="Pairwise LLM Judge")
-    parser.add_argument(
-        "--judge", type=int, default=1, choices=[1, 2],
-        help="Judge number: 1=primary (Claude), 2=secondary (GPT)"
+    Blind mapping of conditions to A/B for a paper: (cond_A, cond_B).
+    Randomised via a deterministic hash so both judges get the SAME assignment.
+    Memoised so judges sharing a process compute it once per paper. The
+    md5 -> Random(seed) derivation must not change: existing judgment files
+    (and resumed runs) rely on these exact assignments.
+    """
+    seed = int(hashlib.md5(paper_id.encode()).hexdigest()[:8], 16)
+    rng = random.Random(RANDOM_SEED + seed)
+    if rng.random() < 0.5:
+        return "peer", "vanilla"
+    return "vanilla", "peer"
+
+
+def build_judge_prompt(paper_id: str, pair: dict,
+                       peer_review: str, vanilla_review: str):
+    """
+    Blind A/B assignment + filled judge prompt for one paper.
+    `pair` is a load_judge_inputs() entry (prompt skeleton already built).
+    Returns (cond_A, cond_B, prompt).
+    """
+    cond_A, cond_B = ab_conditions(paper_id)
+    if cond_A == "peer":
+        review_A, review_B = peer_review, vanilla_review
+    else:
+        review_A, review_B = vanilla_review, peer_review
+
+    # Only the reviews are joined in; the paper part is shared per paper
+    reviews = {"review_A": review_A, "review_B": review_B}
+    prompt = "".join(
+        reviews[part] if i % 2 else part
+        for i, part in enumerate(pair["skeleton"])
     )
-    args = parser.parse_args()
+    return cond_A, cond_B, prompt
+
+
+def judge_one(client: LLMClient, judge_label: str, paper_id: str, prompt: str,
+              cache_prefix_chars: int = 0) -> dict:
+    """
+    Ask the judge for one paper, retrying ties/unparseable output up to
+    JUDGE_MAX_RETRIES_TIE times. Returns the parsed verdict dict; errors are
+    recorded as {"winner": None, "reasoning": "ERROR: ..."}, never raised.
+    """
+    parsed = None
+    for attempt in range(JUDGE_MAX_RETRIES_TIE + 1):
+        try:
+            judge_out = client.generate(
+                prompt,
+                temperature=JUDGE_TEMPERATURE,
+                max_output_tokens=JUDGE_MAX_OUTPUT_TOKENS,
+                cache_prefix_chars=cache_prefix_chars,
+                refresh=attempt > 0,
+            )
+            parsed = parse_judge_output(judge_out)
+        except Exception as e:
+            parsed = {
+                "winner": None,
+                "reasoning": f"ERROR: {str(e)[:200]}",
+            }
+
+        winner = (parsed.get("winner") or "").strip().lower()
+        if winner in ("a", "b"):
+            break
+        if attempt < JUDGE_MAX_RETRIES_TIE:
+            logger.warning(
+                f"[{judge_label}] Paper {paper_id}: judge returned '{winner}' "
+                f"(attempt {attempt + 1}/{JUDGE_MAX_RETRIES_TIE + 1}), retrying..."
+            )
+    return parsed
 
+
+def judge(*, judge_model: str, out_path: Path, judge_label: str,
+          pairs_path: Path = PAIRS_JSONL_PATH,
+          peer_path: Path = REVIEWS_PEER_JSONL,
+          vanilla_path: Path = REVIEWS_VANILLA_JSONL,
+          truncate: bool = True, resume: bool = True,
+          should_stop: Callable[[], bool] | None = None) -> None:
+    """
+    Judge every paper with a pair and both reviews, writing one verdict per
+    paper to out_path. With resume=True papers already in out_path are
+    skipped and new verdicts appended; resume=False starts the file over.
+    truncate=False sends paper text and ground truth untruncated.
+
+    should_stop is checked before each new paper is submitted: once it
+    returns True no further papers are started, the in-flight ones are
+    written, and judge() returns early (resume picks up the rest).
+    """
     ensure_dirs()
     random.seed(RANDOM_SEED)
 
-    # Select judge model and output path
-    if args.judge == 1:
-        judge_model = JUDGE_MODEL_NAME
-        out_path = JUDGMENTS_PAIRWISE_JUDGE1_JSONL
-        judge_label = "judge1_claude"
-    else:
-        judge_model = JUDGE_MODEL_NAME_2
-        out_path = JUDGMENTS_PAIRWISE_JUDGE2_JSONL
-        judge_label = "judge2_gpt"
-
     logger.info(f"Judge: {judge_label} ({judge_model})")
     logger.info(f"Output: {out_path}")
 
-    if not PAIRS_JSONL_PATH.exists():
-        raise FileNotFoundError(
-            f"Pairs file not found: {PAIRS_JSONL_PATH}. "
-            f"Run scripts/01_build_pairs.py first."
-        )
+    pairs_by_id, peer_by_id, vanilla_by_id, common_ids = load_judge_inputs(
+        pairs_path, peer_path, vanilla_path, truncate=truncate,
+    )
 
     template = load_prompt()
-    client = LLMClient(model_name=judge_model)
-
-    # Load data
-    pairs_by_id = {
-        row["paper_id"]: row for row in read_jsonl(PAIRS_JSONL_PATH)
-    }
-
-    peer_by_id = {}
-    if REVIEWS_PEER_JSONL.exists():
-        for row in read_jsonl(REVIEWS_PEER_JSONL):
-            if row.get("error") is None:
-                peer_by_id[row["paper_id"]] = row
-
-    vanilla_by_id = {}
-    if REVIEWS_VANILLA_JSONL.exists():
-        for row in read_jsonl(REVIEWS_VANILLA_JSONL):
-            if row.get("error") is None:
-                vanilla_by_id[row["paper_id"]] = row
-
-    common_ids = sorted(
-        set(pairs_by_id.keys()) & set(peer_by_id.keys()) & set(vanilla_by_id.keys())
+    # Judging instructions precede the paper and are identical for every call
+    cache_prefix_chars = template.index("{paper_text}")
+    client = LLMClient(
+        model_name=judge_model,
+        rate_limiter=RateLimiter(JUDGE_RPM, JUDGE_TPM),
+        use_cache=True,
     )
+
     total = len(common_ids)
     logger.info(f"Papers to judge: {total}")
 
     # Resume: skip already-judged papers
-    done_ids = load_existing_ids(out_path)
+    done_ids = load_done_ids(out_path) if resume else frozenset()
     if done_ids:
         logger.info(f"Resuming: {len(done_ids)} already judged, skipping.")
 
     mode = "a" if done_ids else "w"
 
-    with open(out_path, mode, encoding="utf-8") as out:
-        for idx, paper_id in enumerate(common_ids, 1):
-            if paper_id in done_ids:
-                continue
+    # Up to JUDGE_CONCURRENCY papers are judged at once; verdicts are written
+    # in common_ids order (oldest drained first), as in a sequential run.
+    pending = deque()
 
-            pair = pairs_by_id[paper_id]
-            peer_row = peer_by_id[paper_id]
-            vanilla_row = vanilla_by_id[paper_id]
+    def drain_oldest():
+        idx, paper_id, cond_A, cond_B, fut = pending.popleft()
+        parsed = fut.result()
+        winner = parsed.get("winner")
+        reasoning = parsed.get("reasoning")
 
-            paper_text = truncate_for_judge(
-                pair["paper_text"], JUDGE_PAPER_MAX_CHARS
-            )
-            ground_truth = truncate_for_judge(
-                pair["ground_truth"], JUDGE_GT_MAX_CHARS
-            )
-            peer_review = peer_row["generated_review"]
-            vanilla_review = vanilla_row["generated_review"]
-
-            # Randomly decide mapping to A/B (blind)
-            # Use deterministic hash so both judges get SAME assignment
-            seed = int(hashlib.md5(paper_id.encode()).hexdigest()[:8], 16)
-            rng = random.Random(RANDOM_SEED + seed)
-            if rng.random() < 0.5:
-                cond_A, cond_B = "peer", "vanilla"
-                review_A, review_B = peer_review, vanilla_review
-            else:
-                cond_A, cond_B = "vanilla", "peer"
-                review_A, review_B = vanilla_review, peer_review
-
-            prompt = (
-                template.replace("{paper_text}", paper_text)
-                .replace("{ground_truth}", ground_truth)
-                .replace("{review_A}", review_A)
-                .replace("{review_B}", review_B)
+        # Skip writing if we still don't have a valid A/B winner (no ties in output)
+        if (winner or "").strip().lower() not in ("a", "b"):
+            logger.warning(
+                f"[{judge_label}] Paper {paper_id}: skipping (no valid A/B after retries)"
             )
+            return
+
+        result = {
+            "paper_id": paper_id,
+            "cond_A": cond_A,
+            "cond_B": cond_B,
+            "winner": winner,
+            "reasoning": reasoning,
+            "judge_model": judge_model,
+        }
+
+        out.append(result)
+
+        logger.info(
+            f"[{judge_label}] [{idx}/{total}] paper={paper_id} "
+            f"A={cond_A} B={cond_B} winner={winner}"
+        )
 
-            parsed = None
-            for attempt in range(JUDGE_MAX_RETRIES_TIE + 1):
-                try:
-                    judge_out = client.generate(
-                        prompt,
-                        temperature=JUDGE_TEMPERATURE,
-                        max_output_tokens=JUDGE_MAX_OUTPUT_TOKENS,
-                    )
-                    # Strip markdown code fences if present
-                    cleaned = judge_out.strip()
-                    if cleaned.startswith("```"):
-                        cleaned = cleaned.split("\n", 1)[1]
-                    if cleaned.endswith("```"):
-                        cleaned = cleaned.rsplit("```", 1)[0]
-                    parsed = json.loads(cleaned.strip())
-                except Exception as e:
-                    parsed = {
-                        "winner": None,
-                        "reasoning": f"ERROR: {str(e)[:200]}",
-                    }
-
-                winner = (parsed.get("winner") or "").strip().lower()
-                if winner in ("a", "b"):
-                    break
-                if attempt < JUDGE_MAX_RETRIES_TIE:
-                    logger.warning(
-                        f"Paper {paper_id}: judge returned '{winner}' "
-                        f"(attempt {attempt + 1}/{JUDGE_MAX_RETRIES_TIE + 1}), retrying..."
-                    )
-
-            winner = parsed.get("winner")
-            reasoning = parsed.get("reasoning")
-
-            # Skip writing if we still don't have a valid A/B winner (no ties in output)
-            if (winner or "").strip().lower() not in ("a", "b"):
+    # One paper per judge call, by design: each prompt already carries the full
+    # paper + ground truth + two reviews (up to ~29K tokens), and packing several
+    # papers into one prompt would let verdicts bleed across papers and change
+    # the judging protocol. Throughput comes from concurrency, not batching.
+    with JsonlAppender(out_path, mode, OUTPUT_FLUSH_ROWS,
+                       fsync=OUTPUT_FSYNC, track_ids=True,
+                       flush_secs=OUTPUT_FLUSH_SECS) as out, \
+         ThreadPoolExecutor(max_workers=JUDGE_CONCURRENCY,
+                            thread_name_prefix=judge_label) as pool:
+        for idx, paper_id in enumerate(common_ids, 1):
+            if paper_id in done_ids:
+                continue
+            if should_stop is not None and should_stop():
                 logger.warning(
-                    f"Paper {paper_id}: skipping (no valid A/B after retries)"
+                    f"[{judge_label}] Stop requested: not starting new papers "
+                    f"({len(pending)} in flight)."
                 )
-                continue
+                break
 
-            result = {
-                "paper_id": paper_id,
-                "cond_A": cond_A,
-                "cond_B": cond_B,
-                "winner": winner,
-                "reasoning": reasoning,
-                "judge_model": judge_model,
-            }
-
-            out.write(json.dumps(result, ensure_ascii=False) + "\n")
-            out.flush()
+            cond_A, cond_B, prompt = build_judge_prompt(
+                paper_id, pairs_by_id[paper_id],
+                peer_by_id[paper_id]["generated_review"],
+                vanilla_by_id[paper_id]["generated_review"],
+            )
 
-            logger.info(
-                f"[{idx}/{total}] paper={paper_id} "
-                f"A={cond_A} B={cond_B} winner={winner}"
+            fut = pool.submit(
+                judge_one, client, judge_label, paper_id, prompt,
+                cache_prefix_chars,
             )
+            pending.append((idx, paper_id, cond_A, cond_B, fut))
+            if len(pending) >= JUDGE_CONCURRENCY:
+                drain_oldest()
+
+        while pending:
+            drain_oldest()
 
     logger.info(f"Judging complete ({judge_label}). Saved to: {out_path}")
 
 
+def main(judge_id: int | None = None,
+         should_stop: Callable[[], bool] | None = None):
+    """
+    Pairwise LLM-as-a-Judge with multi-judge support and resume.
+
+    Usage:
+      python scripts/03_judge_pairwise_ab.py               # Judge 1 (Claude, primary)
+      python scripts/03_judge_pairwise_ab.py --judge 2      # Judge 2 (GPT, secondary)
+
+    In-process callers pass judge_id (1=Claude, 2=GPT) directly; argparse is
+    only used when it is None (defaulting to judge 1). Any other id raises
+    ValueError rather than writing to another judge's file. Each judge has
+    its own client and output file, so both can run concurrently in one
+    process; should_stop is passed through to judge(). Other inputs/outputs
+    or settings: call judge() directly.
+    """
+    if judge_id is None:
+        parser = argparse.ArgumentParser(description="Pairwise LLM Judge")
+        parser.add_argument(
+            "--judge", type=int, default=1, choices=[1, 2],
+            help="Judge number: 1=primary (Claude), 2=secondary (GPT)"
+        )
+        judge_id = parser.parse_args().judge
+
+    if judge_id not in JUDGES:
+        raise ValueError(f"Unknown judge_id {judge_id!r} (expected one of {sorted(JUDGES)})")
+    judge_model, out_path, judge_label = JUDGES[judge_id]
+    judge(judge_model=judge_model, out_path=out_path, judge_label=judge_label,
+          should_stop=should_stop)
+
+
 if __name__ == "__main__":
     main()
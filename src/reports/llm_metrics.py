@@ -0,0 +1,105 @@
+# src/reports/llm_metrics.py
+"""
+Latency / throughput report from the per-call metrics CSV written by
+LLMClient (outputs/llm_metrics.csv), for tuning GEN_CONCURRENCY.
+
+For every call, concurrency = number of calls in flight at its midpoint.
+Calls are bucketed by that level; throughput at a level is estimated as
+level / mean latency (requests per second). The suggested setting is the
+level with the best throughput among buckets with enough samples and a
+low rate-limit (HTTP 429) share.
+"""
+
+import csv
+import math
+from bisect import bisect_right
+from collections import defaultdict
+
+from src.config import LLM_METRICS_CSV
+
+MIN_BUCKET_CALLS = 20
+MAX_RATE_LIMITED = 0.01
+
+
+def percentile(sorted_vals: list, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_vals:
+        return float("nan")
+    k = max(0, math.ceil(q * len(sorted_vals)) - 1)
+    return sorted_vals[k]
+
+
+def load_calls(path) -> list:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return [
+            {
+                "start": float(r["t_start"]),
+                "latency": float(r["latency_s"]),
+                "status": r["status"],
+                "model": r["model"],
+            }
+            for r in csv.DictReader(f)
+        ]
+
+
+def add_concurrency(calls: list) -> None:
+    """Set call["concurrency"] = calls in flight at the call's midpoint."""
+    starts = sorted(c["start"] for c in calls)
+    ends = sorted(c["start"] + c["latency"] for c in calls)
+    for c in calls:
+        mid = c["start"] + c["latency"] / 2
+        c["concurrency"] = bisect_right(starts, mid) - bisect_right(ends, mid)
+
+
+def main():
+    if not LLM_METRICS_CSV.exists():
+        print(f"No metrics yet: {LLM_METRICS_CSV}")
+        return
+
+    calls = load_calls(LLM_METRICS_CSV)
+    if not calls:
+        print(f"No calls recorded in {LLM_METRICS_CSV}")
+        return
+    add_concurrency(calls)
+
+    print(f"Calls: {len(calls)}  ({LLM_METRICS_CSV})\n")
+
+    # --- Latency per model (successful calls) ---
+    by_model = defaultdict(list)
+    for c in calls:
+        if c["status"] == "200":
+            by_model[c["model"]].append(c["latency"])
+    print(f"{'model':<32} {'n':>6} {'p50 s':>8} {'p95 s':>8}")
+    for model, lat in sorted(by_model.items()):
+        lat.sort()
+        print(f"{model:<32} {len(lat):>6} {percentile(lat, 0.5):>8.2f} "
+              f"{percentile(lat, 0.95):>8.2f}")
+
+    # --- Throughput vs concurrency ---
+    by_level = defaultdict(list)
+    for c in calls:
+        by_level[c["concurrency"]].append(c)
+
+    print(f"\n{'in-flight':>9} {'n':>6} {'p50 s':>8} {'p95 s':>8} "
+          f"{'429 %':>6} {'req/s':>7}")
+    best = None
+    for level, group in sorted(by_level.items()):
+        lat = sorted(c["latency"] for c in group if c["status"] == "200")
+        limited = sum(c["status"] == "429" for c in group) / len(group)
+        rps = level / (sum(lat) / len(lat)) if lat else 0.0
+        print(f"{level:>9} {len(group):>6} {percentile(lat, 0.5):>8.2f} "
+              f"{percentile(lat, 0.95):>8.2f} {100 * limited:>6.1f} {rps:>7.2f}")
+        if len(group) >= MIN_BUCKET_CALLS and limited <= MAX_RATE_LIMITED:
+            if best is None or rps > best[1]:
+                best = (level, rps)
+
+    if best:
+        print(f"\nBest observed: {best[0]} requests in flight (~{best[1]:.2f} req/s). "
+              f"Generation sends 2 per paper → GEN_CONCURRENCY ≈ {max(1, best[0] // 2)}.")
+    else:
+        print(f"\nNot enough data (need ≥{MIN_BUCKET_CALLS} calls per level "
+              f"with ≤{100 * MAX_RATE_LIMITED:.0f}% HTTP 429).")
+
+
+if __name__ == "__main__":
+    main()
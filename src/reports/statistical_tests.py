@@ -10,7 +10,6 @@ Tests:
   5. Cohen's κ — inter-judge agreement (when two judge files available)
 """
 
-import json
 import math
 import argparse
 from pathlib import Path
@@ -22,19 +21,12 @@ from src.config import (
     REPORTS_DIR,
     ensure_dirs,
 )
-
-
-def read_jsonl(path: Path):
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                yield json.loads(line)
+from src.utils import json_dumpb, normalize_winner, read_jsonl_cached
 
 
 def resolve_winner(row: dict) -> str | None:
     """Map A/B winner back to peer/vanilla. Returns None for ties/invalid (exclude)."""
-    winner = (row.get("winner") or "").lower().strip()
+    winner = normalize_winner(row.get("winner"))
     cond_A = row.get("cond_A")
     cond_B = row.get("cond_B")
 
@@ -49,7 +41,7 @@ def resolve_winner(row: dict) -> str | None:
 def load_outcomes(path: Path) -> list[str]:
     """Load judgment file → list of 'peer'/'vanilla' (ties/invalid excluded)."""
     return [
-        o for row in read_jsonl(path)
+        o for row in read_jsonl_cached(path)
         if (o := resolve_winner(row)) is not None
     ]
 
@@ -58,34 +50,36 @@ def load_outcomes_by_paper(path: Path) -> dict[str, str]:
     """Load judgment file → {paper_id: 'peer'|'vanilla'} (ties/invalid excluded)."""
     return {
         row["paper_id"]: o
-        for row in read_jsonl(path)
+        for row in read_jsonl_cached(path)
         if (o := resolve_winner(row)) is not None
     }
 
 
 # ---- Statistical functions (no scipy dependency) ----
 
-def _binomial_cdf(k: int, n: int, p: float) -> float:
-    """Exact binomial CDF using log-space for numerical stability."""
-    if k < 0:
-        return 0.0
-    if k >= n:
-        return 1.0
-
-    total = 0.0
-    for i in range(k + 1):
-        log_prob = (
-            _log_comb(n, i) + i * math.log(p) + (n - i) * math.log(1 - p)
-        )
-        total += math.exp(log_prob)
-    return min(total, 1.0)
-
-
-def _log_comb(n: int, k: int) -> float:
-    """Log of binomial coefficient."""
-    return (
-        math.lgamma(n + 1) - math.lgamma(k + 1) - math.lgamma(n - k + 1)
-    )
+def _binomial_pmfs(n: int, p: float) -> list[float]:
+    """
+    Binomial pmf(0..n), computed in log space for numerical stability.
+    The log pmf is anchored once at the mode (exact comb()) and extended
+    outward one ratio per term, so rounding only builds up towards the
+    tails instead of across all n terms from pmf(0).
+    """
+    log_p, log_q = math.log(p), math.log(1 - p)
+    log_ratio = log_p - log_q
+    mode = min(n, int((n + 1) * p))
+    log_mode = math.log(math.comb(n, mode)) + mode * log_p + (n - mode) * log_q
+
+    probs = [0.0] * (n + 1)
+    probs[mode] = math.exp(log_mode)
+    log_pmf = log_mode
+    for i in range(mode, n):  # pmf(i+1) = pmf(i) * (n-i)/(i+1) * p/(1-p)
+        log_pmf += math.log((n - i) / (i + 1)) + log_ratio
+        probs[i + 1] = math.exp(log_pmf)
+    log_pmf = log_mode
+    for i in range(mode, 0, -1):  # pmf(i-1) = pmf(i) * i/(n-i+1) * (1-p)/p
+        log_pmf += math.log(i / (n - i + 1)) - log_ratio
+        probs[i - 1] = math.exp(log_pmf)
+    return probs
 
 
 def binomial_test_two_sided(successes: int, trials: int, p0: float = 0.5) -> float:
@@ -97,10 +91,12 @@ def binomial_test_two_sided(successes: int, trials: int, p0: float = 0.5) -> flo
     if trials == 0:
         return 1.0
 
+    # Both tails summed directly from one pmf pass (no 1 - cdf cancellation)
+    probs = _binomial_pmfs(trials, p0)
     # P(X >= successes) for upper tail
-    p_upper = 1.0 - _binomial_cdf(successes - 1, trials, p0)
+    p_upper = min(math.fsum(probs[successes:]), 1.0)
     # P(X <= successes) for lower tail
-    p_lower = _binomial_cdf(successes, trials, p0)
+    p_lower = min(math.fsum(probs[:successes + 1]), 1.0)
 
     # Two-sided: 2 * min(lower, upper)
     return min(2.0 * min(p_upper, p_lower), 1.0)
@@ -156,18 +152,14 @@ def cohens_kappa(outcomes_1: list[str], outcomes_2: list[str]) -> float:
     if n == 0:
         return 0.0
 
-    categories = sorted(set(outcomes_1) | set(outcomes_2))
-
     # Observed agreement
-    agree = sum(1 for a, b in zip(outcomes_1, outcomes_2) if a == b)
+    agree = sum(a == b for a, b in zip(outcomes_1, outcomes_2))
     p_o = agree / n
 
-    # Expected agreement by chance
-    p_e = 0.0
-    for cat in categories:
-        f1 = sum(1 for x in outcomes_1 if x == cat) / n
-        f2 = sum(1 for x in outcomes_2 if x == cat) / n
-        p_e += f1 * f2
+    # Expected agreement by chance (marginals in one pass per list)
+    c1 = Counter(outcomes_1)
+    c2 = Counter(outcomes_2)
+    p_e = sum((c1[cat] / n) * (c2[cat] / n) for cat in sorted(c1.keys() & c2.keys()))
 
     if p_e >= 1.0:
         return 1.0
@@ -194,10 +186,9 @@ def interpret_kappa(k: float) -> str:
 
 def analyze_single_judge(outcomes: list[str], judge_name: str) -> dict:
     """Run all statistical tests for a single judge's outcomes (win/loss only)."""
-    counts = Counter(outcomes)
     total = len(outcomes)
-    peer_wins = counts.get("peer", 0)
-    vanilla_wins = counts.get("vanilla", 0)
+    peer_wins = outcomes.count("peer")
+    vanilla_wins = outcomes.count("vanilla")
 
     # Binomial test
     p_val = binomial_test_two_sided(peer_wins, total, 0.5) if total > 0 else 1.0
@@ -268,34 +259,39 @@ def write_results(results: dict):
     """Write statistical test results to JSON and Markdown."""
     # JSON
     json_path = REPORTS_DIR / "statistical_tests.json"
-    with json_path.open("w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    json_path.write_bytes(json_dumpb(results, indent=True))
 
     # Markdown
     md_path = REPORTS_DIR / "statistical_tests.md"
-    with md_path.open("w", encoding="utf-8") as f:
-        f.write("# Statistical Significance Tests\n\n")
-
-        for judge in results.get("judges", []):
-            f.write(f"## {judge['judge']}\n\n")
-            f.write(f"- Total examples: {judge['total_examples']}\n")
-            f.write(f"- Peer wins: {judge['peer_wins']}\n")
-            f.write(f"- Vanilla wins: {judge['vanilla_wins']}\n\n")
-            f.write(f"### Win Rate\n\n")
-            f.write(f"- Peer: {judge['peer_win_rate']:.3f}\n")
-            f.write(f"- 95% CI: [{judge['ci_95_lower']:.3f}, {judge['ci_95_upper']:.3f}]\n\n")
-            f.write(f"### Significance\n\n")
-            f.write(f"- Binomial test p-value: {judge['binomial_p_value']:.6f}\n")
-            f.write(f"- Significant at α=0.05: {'✅ Yes' if judge['significant_at_005'] else '❌ No'}\n")
-            f.write(f"- Cohen's h: {judge['cohens_h']:.3f} ({judge['effect_size']})\n\n")
-            f.write("---\n\n")
-
-        if "inter_judge" in results:
-            ij = results["inter_judge"]
-            f.write("## Inter-Judge Agreement\n\n")
-            f.write(f"- Cohen's κ: {ij['cohens_kappa']:.3f}\n")
-            f.write(f"- Agreement level: {ij['agreement_level']}\n")
-            f.write(f"- Papers compared: {ij['n_papers_compared']}\n")
+    parts = ["# Statistical Significance Tests\n\n"]
+
+    for judge in results.get("judges", []):
+        significant = "✅ Yes" if judge["significant_at_005"] else "❌ No"
+        parts.append(
+            f"## {judge['judge']}\n\n"
+            f"- Total examples: {judge['total_examples']}\n"
+            f"- Peer wins: {judge['peer_wins']}\n"
+            f"- Vanilla wins: {judge['vanilla_wins']}\n\n"
+            "### Win Rate\n\n"
+            f"- Peer: {judge['peer_win_rate']:.3f}\n"
+            f"- 95% CI: [{judge['ci_95_lower']:.3f}, {judge['ci_95_upper']:.3f}]\n\n"
+            "### Significance\n\n"
+            f"- Binomial test p-value: {judge['binomial_p_value']:.6f}\n"
+            f"- Significant at α=0.05: {significant}\n"
+            f"- Cohen's h: {judge['cohens_h']:.3f} ({judge['effect_size']})\n\n"
+            "---\n\n"
+        )
+
+    if "inter_judge" in results:
+        ij = results["inter_judge"]
+        parts.append(
+            "## Inter-Judge Agreement\n\n"
+            f"- Cohen's κ: {ij['cohens_kappa']:.3f}\n"
+            f"- Agreement level: {ij['agreement_level']}\n"
+            f"- Papers compared: {ij['n_papers_compared']}\n"
+        )
+
+    md_path.write_text("".join(parts), encoding="utf-8")
 
     print(f"Wrote: {json_path}")
     print(f"Wrote: {md_path}")
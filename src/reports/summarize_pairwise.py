@@ -1,8 +1,12 @@
-import json
+import io
+import csv
+import time
+import zipfile
 import argparse
 import logging
 from pathlib import Path
-from datetime import datetime, timezone
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 
 from src.config import (
     JUDGMENTS_PAIRWISE_JUDGE1_JSONL,
@@ -16,48 +20,63 @@ from src.config import (
     REPORTS_DIR,
     ensure_dirs,
 )
+from src.utils import json_dumpb, normalize_winner, read_jsonl_cached
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
 logger = logging.getLogger(__name__)
 
 
-def read_jsonl(path: Path):
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                yield json.loads(line)
+# (winner, cond_A, cond_B) -> winning condition
+_WINNING_CONDITION = {
+    ("a", "peer", "vanilla"): "peer",
+    ("a", "vanilla", "peer"): "vanilla",
+    ("b", "peer", "vanilla"): "vanilla",
+    ("b", "vanilla", "peer"): "peer",
+}
 
 
-def summarize_judgments(in_path: Path, judge_label: str, judge_model: str):
-    """Summarize a single judge's results to JSON, CSV, and MD (win/loss only, no ties)."""
+def _utc_timestamp() -> str:
+    """Current UTC time as ISO 8601 to the second, e.g. 2026-03-03T12:00:00Z."""
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+def summarize_judgments(in_path: Path, judge_label: str, judge_model: str,
+                        timestamp: str | None = None, bundle: bool = False):
+    """
+    Summarize a single judge's results to JSON, CSV, and MD (win/loss only, no ties).
+    `timestamp` (ISO 8601) defaults to now; main() passes one shared value.
+    With bundle=True the three files go into one uncompressed .zip instead.
+    """
     if not in_path.exists():
         raise FileNotFoundError(f"Judgments not found: {in_path}")
 
-    peer_wins = 0
-    vanilla_wins = 0
-
-    for row in read_jsonl(in_path):
-        winner = (row.get("winner") or "").lower().strip()
-        cond_A = row.get("cond_A")
-        cond_B = row.get("cond_B")
-
-        if winner == "a":
-            if cond_A == "peer":
-                peer_wins += 1
-            elif cond_A == "vanilla":
-                vanilla_wins += 1
-        elif winner == "b":
-            if cond_B == "peer":
-                peer_wins += 1
-            elif cond_B == "vanilla":
-                vanilla_wins += 1
-        # Ties/invalid excluded
+    # Pure-Python tally on purpose: parsing costs ~10x the tally (348 rows:
+    # ~1 ms parse vs ~0.1 ms tally), so a NumPy pass would not pay for the
+    # conversion into arrays, let alone for a new dependency. The same holds
+    # for a Numba-compiled loop, which would also need the rows encoded to
+    # int arrays first and adds JIT warm-up to every run.
+    #
+    # Count raw (winner, cond_A, cond_B) tuples in C first, then normalise
+    # and map only the handful of distinct keys (at most ~9 in practice).
+    raw = Counter(
+        (row.get("winner"), row.get("cond_A"), row.get("cond_B"))
+        for row in read_jsonl_cached(in_path)
+    )
+    lookup = _WINNING_CONDITION.get
+    counts = Counter()
+    for (winner, cond_A, cond_B), n in raw.items():
+        counts[lookup((normalize_winner(winner), cond_A, cond_B))] += n
+    # Ties/invalid map to None and are excluded
+    peer_wins = counts["peer"]
+    vanilla_wins = counts["vanilla"]
 
     total = peer_wins + vanilla_wins
     peer_rate = peer_wins / total if total else 0.0
     vanilla_rate = vanilla_wins / total if total else 0.0
+    if timestamp is None:
+        timestamp = _utc_timestamp()
 
+    # Every writer below reads these locals; nothing is looked up twice
     summary = {
         "judge": judge_label,
         "judge_model": judge_model,
@@ -65,7 +84,7 @@ def summarize_judgments(in_path: Path, judge_label: str, judge_model: str):
         "gen_temperature": GEN_TEMPERATURE,
         "gen_max_tokens": GEN_MAX_OUTPUT_TOKENS,
         "judge_temperature": JUDGE_TEMPERATURE,
-        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "timestamp": timestamp,
         "num_examples": total,
         "peer_wins": peer_wins,
         "vanilla_wins": vanilla_wins,
@@ -73,69 +92,99 @@ def summarize_judgments(in_path: Path, judge_label: str, judge_model: str):
         "vanilla_win_rate": vanilla_rate,
     }
 
-    suffix = f"_{judge_label}"
-
-    # JSON
-    json_path = REPORTS_DIR / f"pairwise_summary{suffix}.json"
-    with json_path.open("w", encoding="utf-8") as f:
-        json.dump(summary, f, ensure_ascii=False, indent=2)
-
-    # CSV
-    csv_path = REPORTS_DIR / f"pairwise_summary{suffix}.csv"
-    with csv_path.open("w", encoding="utf-8") as f:
-        f.write("condition,wins,win_rate\n")
-        f.write(f"peer,{peer_wins},{peer_rate}\n")
-        f.write(f"vanilla,{vanilla_wins},{vanilla_rate}\n")
-
-    # Markdown
-    md_path = REPORTS_DIR / f"pairwise_summary{suffix}.md"
-    with md_path.open("w", encoding="utf-8") as f:
-        f.write(f"# Pairwise Results — {judge_label}\n\n")
-        f.write(f"**Judge**: {judge_model}  \n")
-        f.write(f"**Generator**: {GEN_MODEL_NAME}  \n")
-        f.write(f"**Timestamp**: {summary['timestamp']}  \n\n")
-        f.write(f"- Total examples: {total}\n")
-        f.write(f"- Peer wins: {peer_wins}\n")
-        f.write(f"- Vanilla wins: {vanilla_wins}\n\n")
-        f.write("## Win rates\n\n")
-        f.write(f"- Peer: {peer_rate:.3f}\n")
-        f.write(f"- Vanilla: {vanilla_rate:.3f}\n")
-
-    logger.info(f"Wrote: {json_path}")
-    logger.info(f"Wrote: {csv_path}")
-    logger.info(f"Wrote: {md_path}")
-
-
-def main():
-    parser = argparse.ArgumentParser(description="Summarize pairwise results")
-    group = parser.add_mutually_exclusive_group()
-    group.add_argument(
-        "--judge", type=int, default=None, choices=[1, 2],
-        help="Summarize specific judge (1=Claude, 2=GPT)"
+    stem = f"pairwise_summary_{judge_label}"
+
+    # Render all three artifacts in memory, then write them out
+    csv_buf = io.StringIO()
+    csv.writer(csv_buf, lineterminator="\n").writerows([
+        ("condition", "wins", "win_rate"),
+        ("peer", peer_wins, peer_rate),
+        ("vanilla", vanilla_wins, vanilla_rate),
+    ])
+    md_text = (
+        f"# Pairwise Results — {judge_label}\n\n"
+        f"**Judge**: {judge_model}  \n"
+        f"**Generator**: {GEN_MODEL_NAME}  \n"
+        f"**Timestamp**: {timestamp}  \n\n"
+        f"- Total examples: {total}\n"
+        f"- Peer wins: {peer_wins}\n"
+        f"- Vanilla wins: {vanilla_wins}\n\n"
+        "## Win rates\n\n"
+        f"- Peer: {peer_rate:.3f}\n"
+        f"- Vanilla: {vanilla_rate:.3f}\n"
     )
-    group.add_argument(
-        "--all", action="store_true",
-        help="Summarize all available judges"
-    )
-    args = parser.parse_args()
+    artifacts = {
+        f"{stem}.json": json_dumpb(summary, indent=True),
+        f"{stem}.csv": csv_buf.getvalue().encode("utf-8"),
+        f"{stem}.md": md_text.encode("utf-8"),
+    }
 
+    if bundle:
+        # One file per judge instead of three (many variants → fewer inodes)
+        zip_path = REPORTS_DIR / f"{stem}.zip"
+        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED) as zf:
+            for name, data in artifacts.items():
+                zf.writestr(name, data)
+        logger.info(f"Wrote: {zip_path}")
+        return
+
+    for name, data in artifacts.items():
+        path = REPORTS_DIR / name
+        path.write_bytes(data)
+        logger.info(f"Wrote: {path}")
+
+
+def main(all_judges: bool = False, judge: int = 1, bundle: bool = False) -> None:
+    """
+    Summarize judge 1 (default), judge 2, or every judge with output on disk.
+    bundle=True writes one .zip per judge instead of JSON/CSV/MD files.
+    Safe to call repeatedly in-process; the CLI wrapper is cli().
+    """
     ensure_dirs()
 
     judges = []
-    if args.all:
+    if all_judges:
         if JUDGMENTS_PAIRWISE_JUDGE1_JSONL.exists():
             judges.append((JUDGMENTS_PAIRWISE_JUDGE1_JSONL, "judge1_claude", JUDGE_MODEL_NAME))
         if JUDGMENTS_PAIRWISE_JUDGE2_JSONL.exists():
             judges.append((JUDGMENTS_PAIRWISE_JUDGE2_JSONL, "judge2_gpt", JUDGE_MODEL_NAME_2))
-    elif args.judge == 2:
+    elif judge == 2:
         judges.append((JUDGMENTS_PAIRWISE_JUDGE2_JSONL, "judge2_gpt", JUDGE_MODEL_NAME_2))
     else:
         # Default: judge 1
         judges.append((JUDGMENTS_PAIRWISE_JUDGE1_JSONL, "judge1_claude", JUDGE_MODEL_NAME))
 
-    for in_path, label, model in judges:
-        summarize_judgments(in_path, label, model)
+    # One timestamp for the whole run, so all judges' summaries match
+    timestamp = _utc_timestamp()
+
+    # Judges are independent: summarize them concurrently (each one is file I/O)
+    with ThreadPoolExecutor(max_workers=max(1, len(judges))) as pool:
+        futures = [
+            pool.submit(summarize_judgments, *j, timestamp, bundle) for j in judges
+        ]
+        for fut in futures:
+            fut.result()
+
+
+def cli() -> None:
+    """Command-line entrypoint: parse --judge/--all/--bundle and call main()."""
+    parser = argparse.ArgumentParser(description="Summarize pairwise results")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        "--judge", type=int, default=None, choices=[1, 2],
+        help="Summarize specific judge (1=Claude, 2=GPT)"
+    )
+    group.add_argument(
+        "--all", action="store_true",
+        help="Summarize all available judges"
+    )
+    parser.add_argument(
+        "--bundle", action="store_true",
+        help="Write one .zip per judge (JSON+CSV+MD) instead of three files"
+    )
+    args = parser.parse_args()
+    main(all_judges=args.all, judge=args.judge or 1, bundle=args.bundle)
 
 
 if __name__ == "__main__":
-    main()
+    cli()
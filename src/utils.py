@@ -1,40 +1,312 @@
 # Common utility functions used across the project
 
+import atexit
+import functools
 import json
+import mmap
+import os
+import time
 from pathlib import Path
 from typing import Any, Dict, Iterable
 
+try:
+    import orjson  # Fast path (Rust, parses/serializes UTF-8 bytes directly)
+except ImportError:  # pragma: no cover - stdlib fallback
+    orjson = None
+
+# Write buffer for write_jsonl (bytes)
+JSONL_WRITE_BUFFER = 1 << 20
+
+
+# Parse a JSON document from str or bytes (orjson when available). Bound to
+# the parser itself, so per-line loops pay no wrapper call per row
+json_loads = orjson.loads if orjson is not None else json.loads
+
+
+def json_dumpb(obj: Any, indent: bool = False) -> bytes:
+    """
+    Serialize to UTF-8 JSON bytes (orjson when available), for binary-mode
+    writes. Non-ASCII is kept as-is (like ensure_ascii=False); indent=True
+    uses 2 spaces. Non-string dict keys (e.g. ints) become strings, as with
+    stdlib json.
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode("utf-8")
+
+
+def _dumpb(obj: Any) -> bytes:
+    """Serialize one JSONL row to UTF-8 bytes, newline included."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+# Winner spellings judges actually emit, already mapped to canonical form
+_WINNER_CANONICAL = {"a": "a", "b": "b", "A": "a", "B": "b", "tie": "tie"}
+
+
+def normalize_winner(winner: str | None) -> str:
+    """
+    Judge "winner" field -> lowercase, stripped ("A" -> "a", None -> "").
+    The common spellings are a dict hit; only unusual ones (" Tie", "b\n")
+    pay for lower() + strip().
+    """
+    return _WINNER_CANONICAL.get(winner) or (winner or "").lower().strip()
+
 
 def read_json(path: Path) -> Dict[str, Any]:
     """Read a JSON file and return it as a Python dictionary."""
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return json_loads(Path(path).read_bytes())
 
 
 def write_json(path: Path, data: Dict[str, Any]) -> None:
-    """Write a dictionary to a JSON file (pretty formatted)."""
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    """Write a dictionary to a JSON file (pretty formatted, UTF-8 bytes)."""
+    Path(path).write_bytes(json_dumpb(data, indent=True))
 
 
 def write_jsonl(path: Path, rows: Iterable[Dict[str, Any]]) -> None:
     """
     Write an iterable of dictionaries to a JSONL file.
-    JSONL = one JSON object per line.
+    JSONL = one JSON object per line. Rows are encoded straight to bytes and
+    handed to a single writelines() call on a 1 MiB-buffered binary file.
     """
-    with open(path, "w", encoding="utf-8") as f:
-        for row in rows:
-            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    with open(path, "wb", buffering=JSONL_WRITE_BUFFER) as f:
+        f.writelines(map(_dumpb, rows))
 
 
 def append_jsonl(path: Path, row: Dict[str, Any]) -> None:
-    """Append a single dictionary as a new line in a JSONL file."""
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    """
+    Append a single dictionary as a new line in a JSONL file.
+    Opens and closes the file per call: for loops, keep one JsonlAppender
+    open instead.
+    """
+    with JsonlAppender(path, "a", flush_rows=1) as out:
+        out.append(row)
 
 
 def read_jsonl(path: Path):
-    """Read a JSONL file and yield one dictionary per line."""
-    with open(path, "r", encoding="utf-8") as f:
+    """
+    Read a JSONL file and yield one dictionary per line (blank lines skipped).
+    The file is memory-mapped and scanned with find(b"\n"); each line slice
+    goes straight to the parser, with no readline() or line-list allocation.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return  # mmap cannot map an empty file
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            find = mm.find
+            loads = json_loads
+            end = len(mm)
+            start = 0
+            while start < end:
+                nl = find(b"\n", start)
+                if nl < 0:
+                    nl = end
+                line = mm[start:nl]
+                if line and not line.isspace():
+                    yield loads(line)
+                start = nl + 1
+
+
+def read_jsonl_all(path: Path) -> list:
+    """
+    Read a whole (small) JSONL file in one read and return every row as a
+    list, decoded in a single comprehension. For files that fit comfortably
+    in memory (judgments); stream large ones with read_jsonl().
+    """
+    loads = json_loads
+    return [
+        loads(line)
+        for line in Path(path).read_bytes().split(b"\n")
+        if line and not line.isspace()
+    ]
+
+
+@functools.lru_cache(maxsize=8)
+def _read_jsonl_snapshot(path: str, mtime_ns: int, size: int) -> tuple:
+    return tuple(read_jsonl_all(path))
+
+
+def read_jsonl_cached(path: Path) -> tuple:
+    """
+    read_jsonl_all() memoised per process on (path, mtime, size): reports
+    that read the same judgment file several times (summaries, then each
+    statistical test) parse it once; any rewrite of the file invalidates it.
+    Rows are shared between callers, so treat them as read-only.
+    """
+    st = Path(path).stat()
+    return _read_jsonl_snapshot(str(Path(path).resolve()), st.st_mtime_ns, st.st_size)
+
+
+def index_jsonl(path: Path, key: str = "paper_id") -> Dict[Any, tuple]:
+    """
+    Map row[key] -> (byte offset, length) for every row of a JSONL file, in
+    file order. Rows are parsed one at a time and dropped, so building the
+    index never holds more than one row in memory; fetch bodies later with
+    read_jsonl_row().
+    """
+    index = {}
+    offset = 0
+    loads = json_loads
+    with open(path, "rb") as f:
         for line in f:
-            yield json.loads(line.strip())
\ No newline at end of file
+            if not line.isspace():
+                index[loads(line)[key]] = (offset, len(line))
+            offset += len(line)
+    return index
+
+
+def read_jsonl_row(buf, span: tuple) -> Dict[str, Any]:
+    """Parse one row at span=(offset, length) of a bytes-like buffer (e.g. an mmap)."""
+    offset, length = span
+    return json_loads(buf[offset:offset + length])
+
+
+def ids_sidecar_path(path: Path) -> Path:
+    """Sidecar listing the paper_id of every row of an output JSONL."""
+    return Path(path).with_suffix(".ids")
+
+
+def _ids_line(row: Dict[str, Any]) -> str:
+    # "!" marks rows that recorded an error
+    mark = "" if row.get("error") is None else "!"
+    return f"{mark}{row['paper_id']}\n"
+
+
+def _ids_stamp(st: os.stat_result) -> str:
+    # "#" line recording the JSONL (size, mtime) the sidecar is in sync with
+    return f"#{st.st_size} {st.st_mtime_ns}\n"
+
+
+def _read_ids_sidecar(path: Path) -> list:
+    """
+    Sidecar ID lines for `path`. The sidecar ends with a stamp of the JSONL's
+    size and mtime as of its last write; when the sidecar is missing or the
+    stamp does not match the JSONL now (crash between the two writes, or
+    the JSONL was rewritten, e.g. by clean_errors), it is rebuilt.
+    """
+    ids_path = ids_sidecar_path(path)
+    st = Path(path).stat()
+    try:
+        lines = ids_path.read_text(encoding="utf-8").splitlines()
+    except FileNotFoundError:
+        lines = None
+    if lines and lines[-1] == _ids_stamp(st)[:-1]:
+        return [line for line in lines if line[:1] != "#"]
+    lines = [_ids_line(row) for row in read_jsonl(path)]
+    try:
+        ids_path.write_text("".join(lines) + _ids_stamp(st), encoding="utf-8")
+    except OSError:
+        pass  # read-only location: fall back to scanning every time
+    return [line[:-1] for line in lines]
+
+
+def load_done_ids(path: Path, successful_only: bool = False) -> frozenset:
+    """
+    Paper IDs already present in an output JSONL (the resume skip set).
+    Built once per step; callers then do O(1) membership checks.
+    With successful_only=True, rows whose "error" is not None are ignored.
+
+    IDs come from the `.ids` sidecar kept by JsonlAppender(track_ids=True),
+    so the (large) output rows are not parsed on every restart.
+    """
+    if not Path(path).exists():
+        return frozenset()
+    lines = _read_ids_sidecar(path)
+    if successful_only:
+        return frozenset(line for line in lines if line and line[0] != "!")
+    return frozenset(line.lstrip("!") for line in lines if line)
+
+
+class JsonlAppender:
+    """
+    Append rows to a JSONL file with group commit.
+
+    Rows are encoded into an in-memory buffer and written with a single
+    write() + flush() every `flush_rows` rows, or as soon as the buffer
+    passes `flush_bytes`. With `flush_secs`, the first append after the
+    oldest buffered row has waited that long also flushes, so slow
+    producers (seconds per LLM call) do not hold rows back for minutes.
+    A crash loses at most the unflushed rows, which resume then
+    re-processes. Pending rows are flushed on close/__exit__ and, as a
+    fallback, at interpreter exit.
+
+    With fsync=True each batch is also fsync'ed, so committed rows survive
+    a power loss / OS crash, not just a process crash (one fsync per batch).
+
+    With track_ids=True each row's paper_id is also appended to the `.ids`
+    sidecar read by load_done_ids(); it is written right after its batch,
+    followed by a stamp of the JSONL's new size and mtime.
+    """
+
+    def __init__(self, path: Path, mode: str = "a", flush_rows: int = 8,
+                 flush_bytes: int = 64 << 10, fsync: bool = False,
+                 track_ids: bool = False, flush_secs: float | None = None):
+        self.path = path
+        self.fsync = fsync
+        mode = mode.replace("b", "")
+        self._ids = None
+        if track_ids:
+            ids_mode = "w"
+            if mode.startswith("a") and Path(path).exists():
+                _read_ids_sidecar(path)  # bring the sidecar up to date first
+                ids_mode = "a"
+            self._ids = open(ids_sidecar_path(path), ids_mode, encoding="utf-8")
+            self._ids_buf = []
+        self._f = open(path, mode + "b", buffering=1 << 20)
+        self._buf = bytearray()
+        self._rows = 0
+        self.flush_rows = max(1, flush_rows)
+        self.flush_bytes = flush_bytes
+        self.flush_secs = flush_secs
+        self._first_at = 0.0
+        atexit.register(self.flush)
+
+    def append(self, row: Dict[str, Any]) -> None:
+        now = time.monotonic()
+        if not self._rows:
+            self._first_at = now
+        self._buf += _dumpb(row)
+        if self._ids is not None:
+            self._ids_buf.append(_ids_line(row))
+        self._rows += 1
+        if (self._rows >= self.flush_rows
+                or len(self._buf) >= self.flush_bytes
+                or (self.flush_secs is not None
+                    and now - self._first_at >= self.flush_secs)):
+            self.flush()
+
+    def flush(self) -> None:
+        """Write all buffered rows and flush them to the OS."""
+        if self._f.closed:
+            return
+        if not self._buf:
+            return
+        self._f.write(self._buf)
+        self._buf.clear()
+        self._rows = 0
+        self._f.flush()
+        if self.fsync:
+            os.fsync(self._f.fileno())
+        if self._ids is not None:
+            # After the rows: a crash in between leaves a stamp that no
+            # longer matches the JSONL, which makes load_done_ids rebuild it
+            self._ids_buf.append(_ids_stamp(os.fstat(self._f.fileno())))
+            self._ids.write("".join(self._ids_buf))
+            self._ids_buf.clear()
+            self._ids.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self._f.close()
+        if self._ids is not None:
+            self._ids.close()
+        atexit.unregister(self.flush)
+
+    def __enter__(self) -> "JsonlAppender":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,62 @@
+# tests/conftest.py
+"""
+Shared fixtures. No test talks to a real API: LLMClient._generate is
+replaced by a stub, and the response cache / metrics log are disabled.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.generation import llm_client  # noqa: E402
+from src.utils import write_jsonl  # noqa: E402
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """
+    Route every LLMClient call to `responder(model_name, prompt) -> text`.
+    Returns install(responder); calls are recorded as (model, prompt).
+    """
+    calls = []
+
+    def install(responder):
+        def _generate(self, prompt, temperature, max_output_tokens,
+                      cache_prefix_chars=0):
+            calls.append((self.model_name, prompt))
+            return responder(self.model_name, prompt)
+
+        monkeypatch.setattr(llm_client.LLMClient, "_generate", _generate)
+        return calls
+
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test")
+    monkeypatch.setattr(llm_client, "get_response_cache", lambda: None)
+    monkeypatch.setattr(llm_client, "get_metrics_log", lambda: None)
+    return install
+
+
+@pytest.fixture
+def pairs_and_reviews(tmp_path):
+    """
+    Ten pairs and a successful peer/vanilla review for each, on disk.
+    Returns (pairs_path, peer_path, vanilla_path, paper_ids in file order).
+    """
+    ids = [f"paper{i:02d}" for i in range(10)]
+    pairs_path = tmp_path / "pairs.jsonl"
+    peer_path = tmp_path / "reviews_peer.jsonl"
+    vanilla_path = tmp_path / "reviews_vanilla.jsonl"
+    write_jsonl(pairs_path, [
+        {"paper_id": pid, "paper_text": f"<<{pid}>> text", "ground_truth": "gt"}
+        for pid in ids
+    ])
+    for path, condition in ((peer_path, "peer"), (vanilla_path, "vanilla")):
+        write_jsonl(path, [
+            {"paper_id": pid, "generated_review": f"{condition} review",
+             "error": None}
+            for pid in ids
+        ])
+    return pairs_path, peer_path, vanilla_path, ids
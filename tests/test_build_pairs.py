@@ -0,0 +1,161 @@
+# tests/test_build_pairs.py
+
+import os
+import random
+import re
+
+import pytest
+
+import src.data_prep.build_pairs as bp
+from src.utils import write_json
+
+REVIEW_TEXT = "This paper proposes a method. " * 10
+
+
+def _paper(title: str, n_sections: int = 20) -> dict:
+    return {"metadata": {
+        "title": title,
+        "abstractText": f"Abstract of {title}.",
+        "sections": [{"heading": f"{i} Section", "text": "Body text. " * 10}
+                     for i in range(n_sections)],
+    }}
+
+
+@pytest.fixture
+def raw_dataset(tmp_path, monkeypatch):
+    """parsed_pdfs/ + reviews/ in tmp_path; build_pairs pointed at them."""
+    pdfs, reviews = tmp_path / "parsed_pdfs", tmp_path / "reviews"
+    pdfs.mkdir()
+    reviews.mkdir()
+    for paper_id, n_sections in (("10", 20), ("2", 20), ("33", 20), ("7", 0)):
+        write_json(pdfs / f"{paper_id}.pdf.json", _paper(f"Paper {paper_id}", n_sections))
+        write_json(reviews / f"{paper_id}.json",
+                   [{"reviews": [{"comments": REVIEW_TEXT, "TITLE": "review"}]}])
+    write_json(pdfs / "41.pdf.json", _paper("No review"))
+    write_json(pdfs / "._10.pdf.json", {})  # macOS resource fork
+
+    monkeypatch.setattr(bp, "PARSED_PDFS_DIR", pdfs)
+    monkeypatch.setattr(bp, "REVIEWS_DIR", reviews)
+    monkeypatch.setattr(bp, "EXTRACT_CACHE_DIR", tmp_path / ".extract_cache")
+    monkeypatch.setattr(bp, "MAX_WORKERS", 2)
+    return pdfs, reviews
+
+
+def test_collect_strings_document_order_and_limit():
+    obj = {"a": " first ", "b": [{"c": "second"}, "third", 3, None],
+           "d": {"e": "", "f": "fourth"}}
+    assert bp._collect_strings(obj) == ["first", "second", "third", "fourth"]
+    assert bp._collect_strings(obj, max_items=2) == ["first", "second"]
+
+
+def test_collect_strings_deep_nesting():
+    obj = "leaf"
+    for _ in range(10_000):  # far past the recursion limit
+        obj = {"x": [obj]}
+    assert bp._collect_strings(obj) == ["leaf"]
+
+
+def test_build_pairs_in_process_pool(raw_dataset, capsys):
+    pairs = bp.build_pairs()
+
+    # Sorted by file name (as the sequential loop did), quality gates applied
+    assert [p["paper_id"] for p in pairs] == ["10", "2", "33"]
+    assert all(p["paper_text"].startswith("TITLE: Paper ") for p in pairs)
+    assert all(p["ground_truth"] == REVIEW_TEXT.strip() for p in pairs)
+    out = capsys.readouterr().out
+    assert "Missing review file: 1" in out
+    assert "Too-short paper_text (<1500): 1" in out
+
+
+def _clean_text_reference(s: str) -> str:
+    # The original two-pass implementation
+    s = (s or "").strip()
+    s = re.sub(r"[ \t]+", " ", s)
+    s = re.sub(r"\n{3,}", "\n\n", s)
+    return s.strip()
+
+
+def test_clean_text_matches_reference():
+    rng = random.Random(0)
+    samples = ["", None, "plain text", " \t lead", "a\n\n\n\nb", "x \t\t y\t"]
+    samples += ["".join(rng.choice(" \t\nab") for _ in range(rng.randint(0, 40)))
+                for _ in range(2000)]
+    for s in samples:
+        assert bp._clean_text(s) == _clean_text_reference(s), repr(s)
+
+
+def test_extract_paper_text_layout():
+    body = "Body text. " * 200  # long enough that no fallback kicks in
+    paper = {"metadata": {
+        "title": " A Title ",
+        "abstractText": "An abstract.",
+        "sections": [
+            {"heading": "1 Intro", "text": "Intro  text.\n\n\n\nMore."},
+            {"heading": "Empty", "text": "  "},
+            {"text": "No heading."},
+            "not a section",
+            {"heading": "2 Body", "text": body},
+        ],
+    }}
+    assert bp.extract_paper_text(paper) == (
+        "TITLE: A Title\n\nABSTRACT: An abstract.\n\n"
+        "1 Intro\nIntro text.\n\nMore.\n\nNo heading.\n\n"
+        "2 Body\n" + body.strip()
+    )
+
+
+@pytest.mark.parametrize("paper", [
+    {"body": {"paragraphs": ["Fallback text. " * 20]}},  # no structured fields
+    {"metadata": {"title": "Only a title"}, "raw": ["Leaf text. " * 20]},
+])
+def test_extract_paper_text_walks_fallback_once(monkeypatch, paper):
+    walks = []
+    collect = bp._collect_strings
+
+    def counting(obj, max_items=2000):
+        walks.append(obj)
+        return collect(obj, max_items)
+
+    monkeypatch.setattr(bp, "_collect_strings", counting)
+    text = bp.extract_paper_text(paper)
+
+    assert len(walks) == 1
+    assert ("Fallback text." in text) or ("Leaf text." in text)
+
+
+def test_clean_text_paper_scale_input():
+    # Mostly single spaces (the fast path) with scattered runs to collapse
+    rng = random.Random(1)
+    words = ["word", "word ", "a\tb", "x  y", "\n", "\n\n\n\n", " \t "]
+    text = " ".join(rng.choice(words) for _ in range(50_000))
+    assert bp._clean_text(text) == _clean_text_reference(text)
+
+    single_spaced = "one two three\nfour five\n\nsix"
+    assert bp._clean_text(single_spaced) == single_spaced
+
+
+def test_extraction_cache_invalidation(raw_dataset, monkeypatch):
+    pdfs, reviews = raw_dataset
+    task = (pdfs / "10.pdf.json", reviews / "10.json")
+    bp.EXTRACT_CACHE_DIR.mkdir()  # build_pairs() creates it before mapping
+    extractions = []
+    extract = bp.extract_paper_text
+
+    def counting(paper_json):
+        extractions.append(1)
+        return extract(paper_json)
+
+    monkeypatch.setattr(bp, "extract_paper_text", counting)
+
+    first = bp._extract_one(task)
+    assert bp._extract_one(task) == first
+    assert len(extractions) == 1  # second call served from the cache
+
+    st = task[0].stat()
+    os.utime(task[0], ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert bp._extract_one(task) == first
+    assert len(extractions) == 2  # source file changed
+
+    monkeypatch.setattr(bp, "_extract_code_hash", lambda: "edited extractor")
+    assert bp._extract_one(task) == first
+    assert len(extractions) == 3  # extractor code changed
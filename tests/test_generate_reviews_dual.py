@@ -0,0 +1,72 @@
+# tests/test_generate_reviews_dual.py
+
+import re
+import time
+
+import pytest
+
+import src.generation.generate_reviews_dual as gen
+from src.utils import load_done_ids, read_jsonl
+
+_PAPER_RE = re.compile(r"<<(paper\d+)>>")
+
+
+@pytest.fixture
+def gen_paths(tmp_path, monkeypatch, pairs_and_reviews):
+    """Point generation at the fixture pairs and fresh output files."""
+    pairs_path, _, _, ids = pairs_and_reviews
+    peer_path = tmp_path / "out_peer.jsonl"
+    vanilla_path = tmp_path / "out_vanilla.jsonl"
+    monkeypatch.setattr(gen, "PAIRS_JSONL_PATH", pairs_path)
+    monkeypatch.setattr(gen, "REVIEWS_PEER_JSONL", peer_path)
+    monkeypatch.setattr(gen, "REVIEWS_VANILLA_JSONL", vanilla_path)
+    monkeypatch.setattr(gen, "GEN_PAPER_MAX_TOKENS", None)
+    monkeypatch.setattr(gen, "GEN_CONCURRENCY", 3)
+    return peer_path, vanilla_path, ids
+
+
+def test_reviews_written_in_input_order(gen_paths, fake_llm):
+    peer_path, vanilla_path, ids = gen_paths
+
+    def responder(model, prompt):
+        pid = _PAPER_RE.search(prompt).group(1)
+        time.sleep(0.002 * (len(ids) - ids.index(pid)))
+        return f"review of {pid}"
+
+    fake_llm(responder)
+    gen.main()
+
+    for path, condition in ((peer_path, "peer"), (vanilla_path, "vanilla")):
+        rows = list(read_jsonl(path))
+        assert [r["paper_id"] for r in rows] == ids
+        assert {r["condition"] for r in rows} == {condition}
+        assert all(r["generated_review"] == f"review of {r['paper_id']}"
+                   for r in rows)
+
+
+def test_resume_retries_only_failed_papers(gen_paths, fake_llm):
+    peer_path, vanilla_path, ids = gen_paths
+    failing = {ids[1], ids[6]}
+
+    def first_pass(model, prompt):
+        pid = _PAPER_RE.search(prompt).group(1)
+        if pid in failing:
+            raise RuntimeError("HTTP 503")
+        return f"review of {pid}"
+
+    calls = fake_llm(first_pass)
+    gen.main()
+    # Error rows are cleaned out at the end of the run, so resume retries them
+    for path in (peer_path, vanilla_path):
+        assert load_done_ids(path) == frozenset(ids) - failing
+        assert all(r["error"] is None for r in read_jsonl(path))
+
+    calls.clear()
+    fake_llm(lambda model, prompt: "review")
+    gen.main()
+
+    # One peer and one vanilla request per failed paper, nothing else
+    retried = sorted(_PAPER_RE.search(p).group(1) for _, p in calls)
+    assert retried == sorted([*failing, *failing])
+    for path in (peer_path, vanilla_path):
+        assert sorted(r["paper_id"] for r in read_jsonl(path)) == ids
@@ -0,0 +1,27 @@
+# tests/test_judge_batch.py
+
+import pytest
+
+from src.judging.judge_batch import _provider_model, _result_text
+
+
+def test_provider_model():
+    assert _provider_model("anthropic/claude-opus-4.6") == ("anthropic", "claude-opus-4-6")
+    assert _provider_model("openai/gpt-5.2") == ("openai", "gpt-5.2")
+    with pytest.raises(ValueError):
+        _provider_model("google/gemini")
+
+
+def test_result_text_both_providers():
+    anthropic_ok = {"custom_id": "p1", "result": {"type": "succeeded", "message": {
+        "content": [{"type": "text", "text": '{"winner": '},
+                    {"type": "text", "text": '"A"}'}]}}}
+    anthropic_err = {"custom_id": "p1", "result": {"type": "errored"}}
+    openai_ok = {"custom_id": "p1", "response": {"status_code": 200, "body": {
+        "choices": [{"message": {"content": '{"winner": "B"}'}}]}}}
+    openai_err = {"custom_id": "p1", "response": {"status_code": 500, "body": {}}}
+
+    assert _result_text(anthropic_ok) == '{"winner": "A"}'
+    assert _result_text(openai_ok) == '{"winner": "B"}'
+    assert _result_text(anthropic_err) is None
+    assert _result_text(openai_err) is None
@@ -0,0 +1,89 @@
+# tests/test_judge_pairwise_ab.py
+
+import re
+import time
+
+import pytest
+
+import src.judging.judge_pairwise_ab as jp
+from src.utils import load_done_ids, read_jsonl
+
+_PAPER_RE = re.compile(r"<<(paper\d+)>>")
+
+
+def _paper_id(prompt: str) -> str:
+    return _PAPER_RE.search(prompt).group(1)
+
+
+def _run(tmp_path, pairs_and_reviews, **kwargs):
+    pairs_path, peer_path, vanilla_path, _ = pairs_and_reviews
+    out_path = tmp_path / "judgments.jsonl"
+    jp.judge(judge_model="anthropic/test", out_path=out_path,
+             judge_label="test", pairs_path=pairs_path, peer_path=peer_path,
+             vanilla_path=vanilla_path, **kwargs)
+    return out_path
+
+
+def test_verdicts_written_in_input_order(tmp_path, monkeypatch,
+                                         pairs_and_reviews, fake_llm):
+    monkeypatch.setattr(jp, "JUDGE_CONCURRENCY", 4)
+    ids = pairs_and_reviews[3]
+
+    def responder(model, prompt):
+        # Later papers answer first, so completion order is reversed
+        time.sleep(0.002 * (len(ids) - ids.index(_paper_id(prompt))))
+        return '{"winner": "A", "reasoning": "ok"}'
+
+    fake_llm(responder)
+    out_path = _run(tmp_path, pairs_and_reviews)
+
+    rows = list(read_jsonl(out_path))
+    assert [r["paper_id"] for r in rows] == ids
+    assert all(
+        (r["cond_A"], r["cond_B"]) == jp.ab_conditions(r["paper_id"]) for r in rows
+    )
+
+
+def test_resume_retries_only_papers_without_verdict(tmp_path, monkeypatch,
+                                                    pairs_and_reviews, fake_llm):
+    monkeypatch.setattr(jp, "JUDGE_CONCURRENCY", 3)
+    ids = pairs_and_reviews[3]
+    failing = {ids[2], ids[7]}
+
+    def first_pass(model, prompt):
+        if _paper_id(prompt) in failing:
+            return '{"winner": "tie", "reasoning": "undecided"}'
+        return '{"winner": "B", "reasoning": "ok"}'
+
+    calls = fake_llm(first_pass)
+    out_path = _run(tmp_path, pairs_and_reviews)
+    assert load_done_ids(out_path) == frozenset(ids) - failing
+    # Ties are retried JUDGE_MAX_RETRIES_TIE times before the paper is skipped
+    assert sum(_paper_id(p) in failing for _, p in calls) == \
+        len(failing) * (jp.JUDGE_MAX_RETRIES_TIE + 1)
+
+    calls.clear()
+    fake_llm(lambda model, prompt: '{"winner": "A", "reasoning": "ok"}')
+    _run(tmp_path, pairs_and_reviews)
+
+    assert sorted(_paper_id(p) for _, p in calls) == sorted(failing)
+    assert sorted(r["paper_id"] for r in read_jsonl(out_path)) == ids
+
+
+def test_should_stop_stops_submitting(tmp_path, monkeypatch,
+                                      pairs_and_reviews, fake_llm):
+    monkeypatch.setattr(jp, "JUDGE_CONCURRENCY", 2)
+    fake_llm(lambda model, prompt: '{"winner": "A", "reasoning": "ok"}')
+    stop_after = iter([False, False, False])
+
+    out_path = _run(tmp_path, pairs_and_reviews,
+                    should_stop=lambda: next(stop_after, True))
+
+    # Three papers were started before the stop; all of them are written
+    assert [r["paper_id"] for r in read_jsonl(out_path)] == \
+        pairs_and_reviews[3][:3]
+
+
+def test_main_rejects_unknown_judge():
+    with pytest.raises(ValueError):
+        jp.main(3)
@@ -0,0 +1,113 @@
+# tests/test_llm_client.py
+
+import pytest
+import requests
+
+from src.generation import llm_client, rate_limiter
+from src.generation.llm_client import LLMClient, ResponseCache, _server_delay
+from src.generation.rate_limiter import RateLimiter
+
+
+def _response(headers: dict) -> requests.Response:
+    r = requests.Response()
+    r.status_code = 429
+    r.headers.update(headers)
+    return r
+
+
+def test_server_delay_hints(monkeypatch):
+    assert _server_delay(_response({"Retry-After": "7"})) == 7.0
+    assert _server_delay(_response({"Retry-After": "9999"})) == llm_client.MAX_SERVER_DELAY
+    now = 1_700_000_000.0
+    monkeypatch.setattr(llm_client.time, "time", lambda: now)
+    for reset in (now + 5, (now + 5) * 1000):  # epoch seconds or milliseconds
+        delay = _server_delay(_response({
+            "X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(reset),
+        }))
+        assert delay == pytest.approx(5.0)
+    assert _server_delay(_response({"Retry-After": "Wed, 21 Oct 2026 07:28:00 GMT"})) is None
+    assert _server_delay(_response({})) is None
+
+
+def test_response_cache_and_refresh(tmp_path, monkeypatch, fake_llm):
+    calls = fake_llm(lambda model, prompt: f"answer {len(calls)}")
+    cache = ResponseCache(tmp_path / "cache.sqlite3")
+    monkeypatch.setattr(llm_client, "get_response_cache", lambda: cache)
+    client = LLMClient("openai/test", use_cache=True)
+
+    first = client.generate("prompt", temperature=0.0, max_output_tokens=10)
+    assert client.generate("prompt", temperature=0.0, max_output_tokens=10) == first
+    assert len(calls) == 1
+
+    # refresh=True bypasses the cached answer and replaces it
+    refreshed = client.generate("prompt", temperature=0.0, max_output_tokens=10,
+                                refresh=True)
+    assert refreshed != first and len(calls) == 2
+    assert client.generate("prompt", temperature=0.0, max_output_tokens=10) == refreshed
+
+    # A different temperature is a different key
+    client.generate("prompt", temperature=0.5, max_output_tokens=10)
+    assert len(calls) == 3
+
+
+def test_response_cache_is_opt_in(tmp_path, monkeypatch, fake_llm):
+    calls = fake_llm(lambda model, prompt: f"answer {len(calls)}")
+    cache = ResponseCache(tmp_path / "cache.sqlite3")
+    monkeypatch.setattr(llm_client, "get_response_cache", lambda: cache)
+    client = LLMClient("openai/test")
+
+    # Sampled generation: every call is a fresh draw, nothing is stored
+    first = client.generate("prompt", temperature=0.4, max_output_tokens=10)
+    assert client.generate("prompt", temperature=0.4, max_output_tokens=10) != first
+    assert len(calls) == 2
+    key = ResponseCache.key("openai/test", 0.4, 10, "prompt")
+    assert cache.get(key) is None
+
+
+class FakeClock:
+    """Stands in for the time module: sleep() advances monotonic() instantly."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", fake)
+    return fake
+
+
+def test_rate_limiter_blocks_on_empty_bucket_and_pause(clock):
+    limiter = RateLimiter(requests_per_minute=600)  # 10 per second
+    for _ in range(600):
+        limiter.acquire()  # bucket starts full
+    assert clock.slept == []
+    limiter.acquire()  # next slot refills in 0.1 s
+    assert sum(clock.slept) == pytest.approx(0.1)
+
+    clock.slept.clear()
+    limiter.pause(2.0)
+    limiter.acquire()
+    assert sum(clock.slept) == pytest.approx(2.0)
+
+
+def test_rate_limiter_token_bucket(clock):
+    limiter = RateLimiter(tokens_per_minute=6000)  # 100 tokens per second
+    limiter.acquire(tokens=5900)
+    limiter.acquire(tokens=300)  # 200 short: 2 s
+    assert sum(clock.slept) == pytest.approx(2.0)
+
+
+def test_rate_limiter_lets_oversize_request_through(clock):
+    limiter = RateLimiter(tokens_per_minute=1000)
+    limiter.acquire(tokens=50_000)  # capped at a full bucket
+    assert clock.slept == []
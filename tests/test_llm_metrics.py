@@ -0,0 +1,65 @@
+# tests/test_llm_metrics.py
+
+import pytest
+
+from src.generation.llm_client import MetricsLog
+from src.reports import llm_metrics as lm
+
+
+def _write_calls(path, calls):
+    log = MetricsLog(path)
+    for start, latency, status in calls:
+        log.record(start, latency, status, attempt=0, model="openai/test",
+                   prompt_chars=100, usage={"prompt_tokens": 25})
+    log._f.close()
+
+
+def test_metrics_log_round_trip(tmp_path):
+    path = tmp_path / "metrics.csv"
+    _write_calls(path, [(10.0, 1.5, 200)])
+    _write_calls(path, [(12.0, 0.25, 429)])  # reopened: no second header
+
+    assert path.read_text().count("t_start") == 1
+    assert lm.load_calls(path) == [
+        {"start": 10.0, "latency": 1.5, "status": "200", "model": "openai/test"},
+        {"start": 12.0, "latency": 0.25, "status": "429", "model": "openai/test"},
+    ]
+
+
+def test_percentile():
+    vals = [1.0, 2.0, 3.0, 4.0]
+    assert lm.percentile(vals, 0.5) == 2.0
+    assert lm.percentile(vals, 0.95) == 4.0
+    assert lm.percentile([], 0.5) != lm.percentile([], 0.5)  # nan
+
+
+def test_concurrency_at_call_midpoint():
+    calls = [{"start": s, "latency": l} for s, l in [(0, 6), (1, 1), (4, 1), (10, 1)]]
+    lm.add_concurrency(calls)
+    assert [c["concurrency"] for c in calls] == [1, 2, 2, 1]
+
+
+def test_suggests_best_throughput_level(tmp_path, monkeypatch, capsys):
+    n = lm.MIN_BUCKET_CALLS
+    sequential = [(float(i), 1.0, 200) for i in range(n)]  # 1 req/s
+    batches = [(100.0 + 2 * j, 2.0, 200) for j in range(n // 4) for _ in range(4)]
+    path = tmp_path / "metrics.csv"
+    _write_calls(path, sequential + batches)  # 4 in flight at 2 s: 2 req/s
+    monkeypatch.setattr(lm, "LLM_METRICS_CSV", path)
+
+    lm.main()
+
+    out = capsys.readouterr().out
+    assert f"Calls: {2 * n}" in out
+    assert "Best observed: 4 requests in flight (~2.00 req/s)" in out
+    assert "GEN_CONCURRENCY ≈ 2" in out
+
+
+@pytest.mark.parametrize("content", [None, "t_start,latency_s,status,model\n"])
+def test_no_metrics(tmp_path, monkeypatch, capsys, content):
+    path = tmp_path / "metrics.csv"
+    if content is not None:
+        path.write_text(content)
+    monkeypatch.setattr(lm, "LLM_METRICS_CSV", path)
+    lm.main()
+    assert "No " in capsys.readouterr().out
@@ -0,0 +1,201 @@
+# tests/test_run_experiment.py
+
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import run_experiment as rx
+import src.judging.judge_pairwise_ab as jp
+
+N_PAPERS = 20
+WINDOW = 2  # JUDGE_CONCURRENCY in these tests
+WAIT = 10  # seconds; a safety net against hangs, never an assertion
+
+
+@pytest.fixture
+def runner(tmp_path, monkeypatch):
+    """
+    Fresh shutdown flag, SIGINT handler and line-count index per test.
+    runner.handled is released after each SIGINT the handler has processed.
+    """
+    monkeypatch.setattr(rx, "_shutdown_requested", False)
+    monkeypatch.setattr(rx, "JSONL_INDEX_PATH", tmp_path / ".jsonl_index.json")
+    handled = threading.Semaphore(0)
+
+    def handler(sig, frame):
+        try:
+            rx._signal_handler(sig, frame)  # raises SystemExit on the second
+        finally:
+            handled.release()
+
+    monkeypatch.setattr(rx, "handled", handled, raising=False)
+    previous = signal.signal(signal.SIGINT, handler)
+    yield rx
+    signal.signal(signal.SIGINT, previous)
+
+
+class Gate:
+    """LLM stub whose calls block until release is set; counts started calls."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self._started = threading.Semaphore(0)
+
+    def __call__(self, model, prompt):
+        self._started.release()
+        assert self.release.wait(WAIT)
+        return '{"winner": "A", "reasoning": "ok"}'
+
+    def wait_started(self, n: int) -> None:
+        for _ in range(n):
+            assert self._started.acquire(timeout=WAIT)
+
+
+@pytest.fixture
+def gated_judges(tmp_path, monkeypatch, fake_llm):
+    """Both judges on in-memory inputs; every LLM call waits on the gate."""
+    ids = [f"paper{i:02d}" for i in range(N_PAPERS)]
+    skeleton = ("", "review_A", "", "review_B", "")
+    inputs = (
+        {pid: {"skeleton": skeleton} for pid in ids},
+        {pid: {"generated_review": "peer"} for pid in ids},
+        {pid: {"generated_review": "vanilla"} for pid in ids},
+        ids,
+    )
+    monkeypatch.setattr(jp, "load_judge_inputs", lambda *a, **k: inputs)
+    monkeypatch.setattr(jp, "JUDGE_CONCURRENCY", WINDOW)
+    out_paths = (tmp_path / "judge1.jsonl", tmp_path / "judge2.jsonl")
+    monkeypatch.setattr(jp, "JUDGES", {
+        1: ("anthropic/test", out_paths[0], "judge1"),
+        2: ("openai/test", out_paths[1], "judge2"),
+    })
+    gate = Gate()
+    fake_llm(gate)
+    yield gate, out_paths
+    gate.release.set()
+    _join_workers()
+
+
+def _in_background(fn):
+    t = threading.Thread(target=fn)
+    t.start()
+    return t
+
+
+def _join_workers():
+    for t in threading.enumerate():
+        if t is not threading.current_thread():
+            t.join(timeout=WAIT)
+
+
+def _ctrl_c(runner):
+    """
+    SIGINT aimed at the main thread; returns once the handler has run. A signal
+    landing just before the main thread blocks on a lock is only noticed at its
+    next wakeup, so it is re-sent until the handler confirms (repeat signals
+    while one is pending coalesce into a single handler call).
+    """
+    for _ in range(WAIT * 20):
+        signal.pthread_kill(threading.main_thread().ident, signal.SIGINT)
+        if runner.handled.acquire(timeout=0.05):
+            return
+    raise AssertionError("SIGINT was never handled")
+
+
+def _rows(path) -> int:
+    return len(path.read_bytes().splitlines()) if path.exists() else 0
+
+
+def test_first_ctrl_c_stops_both_judges(runner, gated_judges):
+    gate, out_paths = gated_judges
+
+    def interrupt_once_both_windows_are_full():
+        gate.wait_started(2 * WINDOW)
+        _ctrl_c(runner)
+        gate.release.set()
+
+    _in_background(interrupt_once_both_windows_are_full)
+    with pytest.raises(KeyboardInterrupt):
+        runner.step_2_3_judge_both()
+    _join_workers()
+
+    # Only the papers already in flight are finished and written
+    assert [_rows(p) for p in out_paths] == [WINDOW, WINDOW]
+
+
+def test_force_quit_does_not_wait_for_judges(runner, gated_judges):
+    gate, out_paths = gated_judges
+
+    def interrupt_twice():
+        gate.wait_started(2 * WINDOW)
+        _ctrl_c(runner)
+        _ctrl_c(runner)
+
+    _in_background(interrupt_twice)
+    with pytest.raises(SystemExit):
+        runner.step_2_3_judge_both()
+
+    # Returned while every judge call was still blocked on the gate
+    assert not gate.release.is_set()
+    gate.release.set()
+    _join_workers()
+    assert [_rows(p) for p in out_paths] == [WINDOW, WINDOW]
+
+
+def test_failing_judge_stops_the_other(runner, gated_judges, monkeypatch):
+    gate, out_paths = gated_judges
+    judge_main = jp.main
+
+    def main(judge_id, should_stop=None):
+        if judge_id == 1:
+            gate.wait_started(WINDOW)  # judge 2 has a full window in flight
+            raise RuntimeError("judge 1 failed")
+        judge_main(judge_id, should_stop)
+
+    monkeypatch.setattr(jp, "main", main)
+    with pytest.raises(RuntimeError, match="judge 1 failed"):
+        runner.step_2_3_judge_both()
+
+    # The error surfaced while judge 2's calls were still in flight
+    assert not gate.release.is_set()
+    gate.release.set()
+    _join_workers()
+    assert _rows(out_paths[1]) == WINDOW
+
+
+def test_count_jsonl_independent_of_call_order(runner, tmp_path):
+    path = tmp_path / "reviews.jsonl"
+    path.write_bytes(
+        b'{"error": null}\n\n{"error": "x"}\n  \n{"error": null}\n{"partial'
+    )
+
+    for order in (("count", "successful"), ("successful", "count")):
+        runner.JSONL_INDEX_PATH.unlink(missing_ok=True)
+        results = {}
+        for name in order * 2:
+            fn = runner.count_jsonl if name == "count" else runner.count_successful
+            results.setdefault(name, set()).add(fn(path))
+        assert results == {"count": {3}, "successful": {2}}
+
+    # An appended tail is counted the same way as a full scan
+    with open(path, "ab") as f:
+        f.write(b'": 1}\n\n')
+    assert (runner.count_jsonl(path), runner.count_successful(path)) == (4, 3)
+    runner.JSONL_INDEX_PATH.unlink()
+    assert (runner.count_jsonl(path), runner.count_successful(path)) == (4, 3)
+
+
+def test_concurrent_index_writers(runner, tmp_path):
+    paths = []
+    for i in range(8):
+        path = tmp_path / f"out{i}.jsonl"
+        path.write_bytes(b'{"error": null}\n' * (i + 1))
+        paths.append(path)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        counts = list(pool.map(runner.count_jsonl, paths))
+
+    assert counts == list(range(1, 9))
+    assert not list(tmp_path.glob("*.tmp"))  # every writer renamed its own file
@@ -0,0 +1,49 @@
+# tests/test_statistical_tests.py
+
+from fractions import Fraction
+from math import comb
+
+import pytest
+
+from src.reports.statistical_tests import binomial_test_two_sided, cohens_kappa
+
+
+def exact_p_values(trials: int) -> list[float]:
+    """Two-sided binomial p-values (p0 = 0.5) for every k, in exact arithmetic."""
+    coeffs = [comb(trials, i) for i in range(trials + 1)]
+    lower, total = [], 0
+    for c in coeffs:
+        total += c
+        lower.append(total)  # sum of coeffs[0..k]
+    return [
+        float(min(Fraction(2 * min(total - lower[k] + coeffs[k], lower[k]),
+                           2 ** trials), 1))
+        for k in range(trials + 1)
+    ]
+
+
+@pytest.mark.parametrize("trials", [1, 2, 7, 50, 101, 348, 349, 1000])
+def test_binomial_p_values_match_exact(trials):
+    for successes, exact in enumerate(exact_p_values(trials)):
+        assert binomial_test_two_sided(successes, trials) == \
+            pytest.approx(exact, rel=1e-12, abs=1e-300)
+
+
+def test_cohens_kappa():
+    assert cohens_kappa(["peer", "vanilla"] * 5, ["peer", "vanilla"] * 5) == 1.0
+    assert cohens_kappa(["peer", "peer", "vanilla", "vanilla"],
+                        ["peer", "vanilla", "peer", "vanilla"]) == 0.0
+    # p_o = 0.8, p_e = 0.6 * 0.6 + 0.4 * 0.4 = 0.52
+    assert cohens_kappa(list("PPPVVPPPVV"), list("PPPVVPPVPV")) == \
+        pytest.approx((0.8 - 0.52) / 0.48)
+    # One judge always says peer: all agreement is chance
+    assert cohens_kappa(["peer"] * 4, ["peer", "peer", "peer", "vanilla"]) == 0.0
+    assert cohens_kappa([], []) == 0.0
+
+
+def test_binomial_reported_values():
+    # Counts of the two judges in outputs/reports/statistical_tests.json;
+    # 229/348 is decided by the upper tail, summed directly (no 1 - cdf)
+    assert binomial_test_two_sided(229, 348) == pytest.approx(3.83602851758598e-09, rel=1e-12)
+    assert binomial_test_two_sided(199, 349) == pytest.approx(0.010086775664709979, rel=1e-12)
+    assert binomial_test_two_sided(0, 0) == 1.0
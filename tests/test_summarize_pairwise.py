@@ -0,0 +1,148 @@
+# tests/test_summarize_pairwise.py
+
+import csv
+import random
+import re
+import zipfile
+from datetime import datetime, timezone
+
+import pytest
+
+import src.reports.summarize_pairwise as sp
+from src.utils import read_json, write_jsonl
+
+PV = {"cond_A": "peer", "cond_B": "vanilla"}
+VP = {"cond_A": "vanilla", "cond_B": "peer"}
+JUDGE1_ROWS = [  # peer 3, vanilla 2, two rows without a winner
+    {"winner": "A", **PV},
+    {"winner": "b", **PV},
+    {"winner": " B ", **VP},
+    {"winner": "tie", **PV},
+    {"winner": None, **VP},
+    {"winner": "A", **VP},
+    {"winner": "A", **PV},
+]
+
+
+@pytest.fixture
+def reports(tmp_path, monkeypatch):
+    """Judge 1 output on disk; reports go to a fresh directory."""
+    reports_dir = tmp_path / "reports"
+    reports_dir.mkdir()
+    judge1 = tmp_path / "judge1.jsonl"
+    write_jsonl(judge1, JUDGE1_ROWS)
+    monkeypatch.setattr(sp, "REPORTS_DIR", reports_dir)
+    monkeypatch.setattr(sp, "JUDGMENTS_PAIRWISE_JUDGE1_JSONL", judge1)
+    monkeypatch.setattr(sp, "JUDGMENTS_PAIRWISE_JUDGE2_JSONL", tmp_path / "judge2.jsonl")
+    monkeypatch.setattr(sp, "ensure_dirs", lambda: None)
+    return reports_dir
+
+
+def test_csv_summary(reports):
+    sp.main()
+    path = reports / "pairwise_summary_judge1_claude.csv"
+    assert b"\r" not in path.read_bytes()
+    with open(path, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows == [
+        ["condition", "wins", "win_rate"],
+        ["peer", "3", "0.6"],
+        ["vanilla", "2", "0.4"],
+    ]
+
+
+def test_json_csv_md_agree(reports):
+    sp.main()
+    stem = reports / "pairwise_summary_judge1_claude"
+    summary = read_json(stem.with_suffix(".json"))
+    assert {k: summary[k] for k in
+            ("judge", "num_examples", "peer_wins", "vanilla_wins",
+             "peer_win_rate", "vanilla_win_rate")} == {
+        "judge": "judge1_claude", "num_examples": 5, "peer_wins": 3,
+        "vanilla_wins": 2, "peer_win_rate": 0.6, "vanilla_win_rate": 0.4,
+    }
+    md = stem.with_suffix(".md").read_text(encoding="utf-8")
+    for line in ("- Total examples: 5", "- Peer wins: 3", "- Vanilla wins: 2",
+                 "- Peer: 0.600", "- Vanilla: 0.400",
+                 f"**Timestamp**: {summary['timestamp']}"):
+        assert line in md
+
+
+def test_all_judges_summarized(reports):
+    write_jsonl(sp.JUDGMENTS_PAIRWISE_JUDGE2_JSONL, [{"winner": "A", **PV}] * 2)
+    sp.main(all_judges=True)
+    one = read_json(reports / "pairwise_summary_judge1_claude.json")
+    two = read_json(reports / "pairwise_summary_judge2_gpt.json")
+    assert (one["peer_wins"], one["vanilla_wins"]) == (3, 2)
+    assert (two["peer_wins"], two["vanilla_wins"]) == (2, 0)
+    assert two["judge_model"] == sp.JUDGE_MODEL_NAME_2
+
+
+def test_judge_error_is_raised(reports):
+    # --all skips judges without output; asking for one explicitly fails
+    sp.main(all_judges=True)
+    assert not (reports / "pairwise_summary_judge2_gpt.json").exists()
+    with pytest.raises(FileNotFoundError):
+        sp.main(judge=2)
+
+
+def test_judges_share_one_timestamp(reports, monkeypatch):
+    stamps = iter(f"2026-01-01T00:00:0{i}Z" for i in range(10))
+    monkeypatch.setattr(sp, "_utc_timestamp", lambda: next(stamps))
+    write_jsonl(sp.JUDGMENTS_PAIRWISE_JUDGE2_JSONL, [{"winner": "A", **PV}])
+    sp.main(all_judges=True)
+    assert {
+        read_json(reports / f"pairwise_summary_{label}.json")["timestamp"]
+        for label in ("judge1_claude", "judge2_gpt")
+    } == {"2026-01-01T00:00:00Z"}
+
+
+def _naive_tally(rows):
+    """Per-row reference for the tuple-Counter tally."""
+    wins = {"peer": 0, "vanilla": 0}
+    for row in rows:
+        winner = (row.get("winner") or "").lower().strip()
+        if winner not in ("a", "b"):
+            continue
+        cond = row.get("cond_A") if winner == "a" else row.get("cond_B")
+        if {row.get("cond_A"), row.get("cond_B")} == {"peer", "vanilla"}:
+            wins[cond] += 1
+    return wins
+
+
+def test_tally_matches_per_row_reference(reports):
+    rng = random.Random(0)
+    spellings = ["A", "B", "a", "b", " A", "b\n", "Tie", "tie", "", None, "C"]
+    conds = [PV, VP, PV, VP, {"cond_A": "peer"}, {}]
+    rows = [{"winner": rng.choice(spellings), **rng.choice(conds)}
+            for _ in range(500)]
+    write_jsonl(sp.JUDGMENTS_PAIRWISE_JUDGE1_JSONL, rows)
+    sp.main()
+    summary = read_json(reports / "pairwise_summary_judge1_claude.json")
+    expected = _naive_tally(rows)
+    assert (summary["peer_wins"], summary["vanilla_wins"]) == \
+        (expected["peer"], expected["vanilla"])
+
+
+def test_utc_timestamp_format():
+    before = datetime.now(timezone.utc).replace(microsecond=0)
+    stamp = sp._utc_timestamp()
+    assert re.fullmatch(r"\d{4}-\d\d-\d\dT\d\d:\d\d:\d\dZ", stamp)
+    parsed = datetime.strptime(stamp, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+    assert before <= parsed <= datetime.now(timezone.utc)
+
+
+def test_bundle_matches_loose_files(reports, monkeypatch):
+    monkeypatch.setattr(sp, "_utc_timestamp", lambda: "2026-01-01T00:00:00Z")
+    sp.main()
+    stem = "pairwise_summary_judge1_claude"
+    loose = {p.name: p.read_bytes() for p in reports.iterdir()}
+    for p in reports.iterdir():
+        p.unlink()
+
+    sp.main(bundle=True)
+    assert [p.name for p in reports.iterdir()] == [f"{stem}.zip"]
+    with zipfile.ZipFile(reports / f"{stem}.zip") as zf:
+        assert all(info.compress_type == zipfile.ZIP_STORED for info in zf.infolist())
+        bundled = {name: zf.read(name) for name in zf.namelist()}
+    assert bundled == loose
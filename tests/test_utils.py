@@ -0,0 +1,100 @@
+# tests/test_utils.py
+
+import os
+
+from src import utils
+from src.utils import (
+    JsonlAppender,
+    append_jsonl,
+    ids_sidecar_path,
+    load_done_ids,
+    read_json,
+    read_jsonl,
+    read_jsonl_all,
+    write_json,
+    write_jsonl,
+)
+
+
+def test_jsonl_round_trip(tmp_path):
+    path = tmp_path / "rows.jsonl"
+    rows = [{"paper_id": "p1", "text": "é \u2028"}, {"paper_id": "p2", "n": 1}]
+    write_jsonl(path, rows)
+    assert list(read_jsonl(path)) == rows
+    assert read_jsonl_all(path) == rows
+
+    # Blank lines skipped, last line without a trailing newline still read
+    path.write_bytes(b'{"n": 1}\n\n  \n{"n": 2}')
+    assert list(read_jsonl(path)) == [{"n": 1}, {"n": 2}]
+    assert read_jsonl_all(path) == [{"n": 1}, {"n": 2}]
+
+    path.write_bytes(b"")  # mmap cannot map an empty file
+    assert list(read_jsonl(path)) == []
+
+
+def test_write_json_stringifies_keys(tmp_path):
+    path = tmp_path / "summary.json"
+    write_json(path, {"rate": 0.5, 1: ["é"]})
+    text = path.read_text(encoding="utf-8")
+    assert "\n  " in text and "é" in text  # indented, not ASCII-escaped
+    assert read_json(path) == {"rate": 0.5, "1": ["é"]}
+
+
+def test_append_jsonl_is_unbuffered(tmp_path):
+    path = tmp_path / "out.jsonl"
+    append_jsonl(path, {"paper_id": "p0"})
+    assert list(read_jsonl(path)) == [{"paper_id": "p0"}]
+    append_jsonl(path, {"paper_id": "p1"})
+    assert [r["paper_id"] for r in read_jsonl(path)] == ["p0", "p1"]
+
+
+def test_appender_flushes_pending_rows_on_close(tmp_path):
+    path = tmp_path / "out.jsonl"
+    with JsonlAppender(path, "w", flush_rows=10) as out:
+        for i in range(3):
+            out.append({"paper_id": f"p{i}", "error": None})
+        assert path.read_bytes() == b""  # still buffered
+    assert [r["paper_id"] for r in read_jsonl(path)] == ["p0", "p1", "p2"]
+
+
+def test_appender_flushes_rows_older_than_flush_secs(tmp_path, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(utils.time, "monotonic", lambda: now[0])
+    path = tmp_path / "out.jsonl"
+    with JsonlAppender(path, "w", flush_rows=100, flush_secs=30) as out:
+        out.append({"paper_id": "p0"})
+        now[0] += 29
+        out.append({"paper_id": "p1"})
+        assert path.read_bytes() == b""
+        now[0] += 1  # p0 has now waited flush_secs
+        out.append({"paper_id": "p2"})
+        assert len(list(read_jsonl(path))) == 3
+
+
+def test_done_ids_from_sidecar(tmp_path):
+    path = tmp_path / "out.jsonl"
+    with JsonlAppender(path, "w", flush_rows=2, track_ids=True) as out:
+        for i, error in enumerate([None, "HTTP 500", None]):
+            out.append({"paper_id": f"p{i}", "error": error})
+
+    assert ids_sidecar_path(path).exists()
+    assert load_done_ids(path) == {"p0", "p1", "p2"}
+    assert load_done_ids(path, successful_only=True) == {"p0", "p2"}
+
+
+def test_sidecar_rebuilt_after_rewrite_in_same_tick(tmp_path):
+    path = tmp_path / "out.jsonl"
+    with JsonlAppender(path, "w", track_ids=True) as out:
+        for i in range(3):
+            out.append({"paper_id": f"p{i}", "error": None})
+    st = path.stat()
+
+    # Rewrite (as clean_errors does) and restore the old mtime
+    write_jsonl(path, [{"paper_id": "p0", "error": None}])
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    assert load_done_ids(path) == {"p0"}
+
+    with JsonlAppender(path, "a", flush_rows=1, track_ids=True) as out:
+        out.append({"paper_id": "p9", "error": None})
+    assert load_done_ids(path) == {"p0", "p9"}